@@ -1,11 +1,23 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import argparse
+import fnmatch
+import io
+import json
 import logging
 import os
+import queue
+import re
+import socket
+import sqlite3
+import struct
 import time # timeモジュールをインポート
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional, Dict, Any
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional, Dict, Any, Tuple
 
 # PyYAMLのインポートチェック
 try:
@@ -16,18 +28,94 @@ except ImportError:
 
 import DaVinciResolveScript as dvr_script
 
-# ログの設定
+# ログの書式
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# ログの設定（設定ファイルの読み込み後にsetup_loggingで非同期の出力に切り替える）
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
+    format=LOG_FORMAT
 )
 
+# 正規表現として扱うルール名の接頭辞
+REGEX_RULE_PREFIX = "re:"
+
+class RuleSet:
+    """カメラ・レンズ名のルール（完全一致・ワイルドカード・正規表現）を優先度順に照合するクラス
+
+    ルール名に * ? [ ] を含む場合はワイルドカード、"re:"で始まる場合は正規表現として扱います。
+    各ルールの priority（デフォルト0）が大きいものを優先し、同じ優先度では完全一致、記述順の順に優先します。
+    """
+    def __init__(self, section: Optional[Dict[str, Any]], kind: str):
+        self.exact = {}     # 名前をキーとした(優先度, 設定)
+        self.patterns = []  # (優先度, 記述順, コンパイル済みパターン, 設定)
+        self._memo = {}     # 名前をキーとした照合結果
+        for order, (name, settings) in enumerate((section or {}).items()):
+            settings = settings or {}
+            if not isinstance(settings, dict):
+                logging.error(f"{kind}設定の形式が不正なためスキップします: {name}")
+                continue
+            priority = settings.get('priority', 0)
+            name = str(name)
+            if name.startswith(REGEX_RULE_PREFIX):
+                try:
+                    pattern = re.compile(name[len(REGEX_RULE_PREFIX):])
+                except re.error as e:
+                    logging.error(f"{kind}設定の正規表現が不正なためスキップします: {name}, エラー: {str(e)}")
+                    continue
+            elif any(char in name for char in "*?["):
+                pattern = re.compile(fnmatch.translate(name))
+            else:
+                self.exact[name] = (priority, settings)
+                continue
+            self.patterns.append((priority, order, pattern, settings))
+        self.patterns.sort(key=lambda rule: (-rule[0], rule[1]))
+
+    def match(self, name: Optional[str]) -> Optional[Dict[str, Any]]:
+        """名前に一致する最も優先度の高いルールの設定を返す（一致しない場合はNone）"""
+        if not name:
+            return None
+        if name in self._memo:
+            return self._memo[name]
+        best = self.exact.get(name)
+        for priority, _, pattern, settings in self.patterns:
+            if best and best[0] >= priority:
+                break
+            if pattern.fullmatch(name):
+                best = (priority, settings)
+                break
+        result = best[1] if best else None
+        self._memo[name] = result
+        return result
+
 class Config:
     """設定管理クラス"""
     def __init__(self, config_path: str = "config.yaml"):
         # カレントディレクトリを基準にパスを解決
         self.config_path = os.path.abspath(config_path)
         self.config = self._load_config()
+        self._compile_rules()
+
+    def _compile_rules(self):
+        """カメラ・レンズ設定をルールにコンパイルし、参照されているDRXファイルの存在を確認"""
+        self.camera_rules = RuleSet(self.config.get('cameras'), "カメラ")
+        self.lens_rules = RuleSet(self.config.get('lenses'), "レンズ")
+        self._clip_settings = {}  # (カメラ, レンズ)をキーとした(PowerGradeのパス, Distortion値)
+        self._pairing_formats = {}  # カメラをキーとした(基準形式の優先順, RAW形式の優先順)
+
+        self.check_power_grades()
+
+    def check_power_grades(self):
+        """参照されているDRXファイルの存在を確認"""
+        power_grade_paths = [self.config.get('default', {}).get('power_grade')]
+        power_grade_paths += [settings.get('power_grade') for _, settings in self.camera_rules.exact.values()]
+        power_grade_paths += [settings.get('power_grade') for _, _, _, settings in self.camera_rules.patterns]
+        self._power_grade_exists = {}
+        for path in power_grade_paths:
+            if path and path not in self._power_grade_exists:
+                self._power_grade_exists[path] = os.path.exists(path)
+                if not self._power_grade_exists[path]:
+                    logging.error(f"PowerGradeファイルが存在しません: {path}")
 
     def _load_config(self) -> Dict[str, Any]:
         """設定ファイルを読み込む"""
@@ -54,19 +142,56 @@ class Config:
 
     def get_power_grade_path(self, camera_type: Optional[str]) -> Optional[str]:
         """カメラタイプに応じたPowerGradeのパスを取得"""
-        if camera_type and camera_type in self.config.get('cameras', {}):
-            path = self.config['cameras'][camera_type].get('power_grade')
-            logging.info(f"カメラ {camera_type} のPowerGrade: {path}")
-            return path
-        logging.info(f"カメラ {camera_type} の設定が見つからないためデフォルト使用")
+        settings = self.camera_rules.match(camera_type)
+        if settings is not None:
+            return settings.get('power_grade')
         return self.config.get('default', {}).get('power_grade')
 
     def get_distortion(self, lens_type: Optional[str]) -> float:
         """レンズタイプに応じたDistortion値を取得"""
-        if lens_type and lens_type in self.config.get('lenses', {}):
-            return self.config['lenses'][lens_type].get('distortion', 0)
+        settings = self.lens_rules.match(lens_type)
+        if settings is not None:
+            return settings.get('distortion', 0)
         return self.config.get('default', {}).get('distortion', 0)
 
+    def get_clip_settings(self, camera_type: Optional[str], lens_type: Optional[str]) -> Tuple[Optional[str], float]:
+        """カメラとレンズの組み合わせに応じた(PowerGradeのパス, Distortion値)を取得（組み合わせごとにキャッシュ）"""
+        key = (camera_type, lens_type)
+        if key not in self._clip_settings:
+            if self.camera_rules.match(camera_type) is not None:
+                logging.info(f"カメラ {camera_type} のPowerGrade: {self.get_power_grade_path(camera_type)}")
+            else:
+                logging.info(f"カメラ {camera_type} の設定が見つからないためデフォルト使用")
+            self._clip_settings[key] = (self.get_power_grade_path(camera_type), self.get_distortion(lens_type))
+        return self._clip_settings[key]
+
+    def should_pair_by_directory(self) -> bool:
+        """ペアの判定にファイルのフォルダも含めるかどうかを取得"""
+        return self.config.get('pairing', {}).get('match_directory', False)
+
+    def get_pairing_formats(self, camera_type: Optional[str]) -> Tuple[tuple, tuple]:
+        """カメラに応じた(ペアの基準とする形式の優先順, ペアの相手とするRAW形式の優先順)を取得"""
+        if camera_type not in self._pairing_formats:
+            pairing = self.config.get('pairing', {})
+            primary_formats = [str(f).lower() for f in pairing.get('primary_formats') or DEFAULT_PRIMARY_FORMATS]
+            raw_formats = [str(f).lower() for f in pairing.get('raw_formats') or DEFAULT_RAW_FORMATS]
+            # カメラ設定で指定された形式を最優先にする
+            settings = self.camera_rules.match(camera_type) or {}
+            if settings.get('primary_format'):
+                preferred = str(settings['primary_format']).lower()
+                primary_formats = [preferred] + [f for f in primary_formats if f != preferred]
+            if settings.get('raw_format'):
+                preferred = str(settings['raw_format']).lower()
+                raw_formats = [preferred] + [f for f in raw_formats if f != preferred]
+            self._pairing_formats[camera_type] = (tuple(primary_formats), tuple(raw_formats))
+        return self._pairing_formats[camera_type]
+
+    def power_grade_exists(self, path: str) -> bool:
+        """PowerGradeファイルが存在するかどうかを取得（読み込み時・check_power_grades呼び出し時の確認結果を使用）"""
+        if path not in self._power_grade_exists:
+            self._power_grade_exists[path] = os.path.exists(path)
+        return self._power_grade_exists[path]
+
     def get_still_type(self) -> str:
         """共通設定からスチルタイプを取得"""
         return self.config.get('common', {}).get('still_type', "スチル")
@@ -74,6 +199,107 @@ class Config:
     def get_rotation_angle(self) -> float:
         """共通設定から回転角度を取得"""
         return self.config.get('common', {}).get('rotation_angle', 90.0)
+
+    def is_cache_enabled(self) -> bool:
+        """永続メタデータキャッシュを使用するかどうかを取得"""
+        return self.config.get('cache', {}).get('enabled', True)
+
+    def get_cache_path(self) -> str:
+        """永続メタデータキャッシュのパスを取得（相対パスは設定ファイルのフォルダ基準）"""
+        path = self.config.get('cache', {}).get('path', "drsorter_cache.db")
+        return os.path.join(os.path.dirname(self.config_path), path)
+
+    def get_cache_max_age_days(self) -> int:
+        """永続メタデータキャッシュの未使用エントリを保持する日数を取得"""
+        return self.config.get('cache', {}).get('max_age_days', 180)
+
+    def should_prune_missing_files(self) -> bool:
+        """存在しない・更新されたファイルのキャッシュエントリを削除するかどうかを取得"""
+        return self.config.get('cache', {}).get('prune_missing_files', False)
+
+    def is_incremental(self) -> bool:
+        """配置済みのクリップを除き、新しいクリップだけを既存のタイムラインに追加するかどうかを取得"""
+        return self.config.get('incremental', {}).get('enabled', False)
+
+    def get_metadata_source(self) -> str:
+        """メタデータの取得元を取得（"resolve": Resolve API、"header": 画像ファイルのヘッダー）"""
+        return self.config.get('metadata', {}).get('source', "resolve")
+
+    def get_header_workers(self) -> int:
+        """ヘッダー読み取りの並列スレッド数を取得"""
+        return max(1, int(self.config.get('metadata', {}).get('workers', 8)))
+
+    def is_profiling_enabled(self) -> bool:
+        """Resolve API呼び出しの計測を行うかどうかを取得"""
+        return self.config.get('profiling', {}).get('enabled', False)
+
+    def get_profiling_json_path(self) -> Optional[str]:
+        """計測結果を書き出すJSONファイルのパスを取得（相対パスは設定ファイルのフォルダ基準）"""
+        path = self.config.get('profiling', {}).get('json_path')
+        if not path:
+            return None
+        return os.path.join(os.path.dirname(self.config_path), path)
+
+    def get_log_level(self) -> int:
+        """コンソールに出力するログレベルを取得"""
+        level = logging.getLevelName(str(self.config.get('logging', {}).get('level', "INFO")).upper())
+        return level if isinstance(level, int) else logging.INFO
+
+    def get_log_json_path(self) -> Optional[str]:
+        """クリップごとの処理結果を追記するJSON Linesファイルのパスを取得（相対パスは設定ファイルのフォルダ基準）"""
+        path = self.config.get('logging', {}).get('json_path')
+        if not path:
+            return None
+        return os.path.join(os.path.dirname(self.config_path), path)
+
+    def get_chunk_size(self) -> int:
+        """1回にまとめて処理するクリップ数を取得（0の場合は分割しない）"""
+        return max(0, int(self.config.get('chunking', {}).get('chunk_size', 0)))
+
+    def get_max_clips_per_timeline(self) -> int:
+        """1つのタイムラインに配置するクリップ数の上限を取得（0の場合は上限なし）"""
+        return max(0, int(self.config.get('chunking', {}).get('max_clips_per_timeline', 0)))
+
+    def get_batch_folders(self) -> list:
+        """バッチモードで処理するビンのパスのリストを取得"""
+        return [str(path) for path in self.config.get('batch', {}).get('folders') or []]
+
+    def is_batch_recursive(self) -> bool:
+        """サブフォルダもたどって処理するかどうかを取得"""
+        return self.config.get('batch', {}).get('recursive', False)
+
+    def is_batch_mode(self) -> bool:
+        """複数のビンを処理するバッチモードかどうかを取得"""
+        return bool(self.get_batch_folders()) or self.is_batch_recursive()
+
+    def should_merge_batch(self) -> bool:
+        """バッチモードで全ビンのクリップを解像度ごとにまとめるかどうかを取得"""
+        return self.config.get('batch', {}).get('merge', False)
+
+    def get_ingest_source(self) -> Optional[str]:
+        """取り込む写真のフォルダを取得（未設定の場合はNone）"""
+        return self.config.get('ingest', {}).get('source') or None
+
+    def get_ingest_bin(self) -> str:
+        """取り込み先のビンの名前を取得"""
+        return self.config.get('ingest', {}).get('bin', "DRSorter Ingest")
+
+    def get_ingest_workers(self) -> int:
+        """フォルダの走査・ヘッダー読み取りの並列スレッド数を取得"""
+        return max(1, int(self.config.get('ingest', {}).get('workers', 8)))
+
+    def get_import_batch_size(self) -> int:
+        """ImportMediaに一度に渡すファイル数を取得"""
+        return max(1, int(self.config.get('ingest', {}).get('import_batch_size', 500)))
+
+    def get_daemon_address(self) -> Tuple[str, int]:
+        """デーモンの待ち受けアドレスとポートを取得"""
+        daemon = self.config.get('daemon', {})
+        return daemon.get('host', "127.0.0.1"), int(daemon.get('port', 50517))
+
+    def get_append_chunk_size(self) -> int:
+        """タイムラインへ一度に追加するクリップ数を取得"""
+        return max(1, int(self.config.get('timeline', {}).get('append_chunk_size', 1000)))
     
     def should_force_color_settings(self) -> bool:
         """カラー設定を強制するかどうかを取得"""
@@ -94,6 +320,301 @@ class Config:
             return color_mgmt.get(config_key)
         return None
 
+# API呼び出しの戻り値に付ける計測上の名前（メソッド名 → オブジェクトの種類）
+API_RETURN_LABELS = {
+    "GetProjectManager": "ProjectManager",
+    "GetCurrentProject": "Project",
+    "GetMediaPool": "MediaPool",
+    "GetRootFolder": "Folder",
+    "GetCurrentFolder": "Folder",
+    "GetSubFolderList": "Folder",
+    "AddSubFolder": "Folder",
+    "GetClipList": "MediaPoolItem",
+    "ImportMedia": "MediaPoolItem",
+    "GetMediaPoolItem": "MediaPoolItem",
+    "CreateEmptyTimeline": "Timeline",
+    "GetCurrentTimeline": "Timeline",
+    "GetTimelineByIndex": "Timeline",
+    "AppendToTimeline": "TimelineItem",
+    "GetItemListInTrack": "TimelineItem",
+    "GetNodeGraph": "Graph",
+}
+
+# 計測対象としてプロキシで包まない値の型
+API_PLAIN_TYPES = (str, bytes, int, float, bool, dict, type(None))
+
+class ApiProxy:
+    """Resolve APIオブジェクトを包み、メソッド呼び出しの回数と時間を記録する透過プロキシ"""
+    __slots__ = ("_target", "_label", "_profiler")
+
+    def __init__(self, target, label: str, profiler: "ApiProfiler"):
+        self._target = target
+        self._label = label
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+        method_name = f"{self._label}.{name}"
+        profiler = self._profiler
+
+        def call(*args, **kwargs):
+            args = [unwrap_api_object(arg) for arg in args]
+            start = time.perf_counter()
+            try:
+                result = attr(*args, **kwargs)
+            finally:
+                profiler.record_call(method_name, time.perf_counter() - start)
+            return profiler.wrap(result, API_RETURN_LABELS.get(name, "Object"))
+        return call
+
+    def __eq__(self, other):
+        return self._target == unwrap_api_object(other)
+
+    def __hash__(self):
+        return hash(self._target)
+
+    def __bool__(self):
+        return bool(self._target)
+
+def unwrap_api_object(value):
+    """プロキシ（とそのリスト）を元のAPIオブジェクトに戻す"""
+    if isinstance(value, ApiProxy):
+        return value._target
+    if isinstance(value, (list, tuple)):
+        return type(value)(unwrap_api_object(element) for element in value)
+    return value
+
+class ApiProfiler:
+    """Resolve API呼び出しとフェーズごとの処理時間を計測するクラス"""
+    def __init__(self):
+        self.call_times = {}   # "オブジェクト.メソッド"をキーとした呼び出しごとの所要時間のリスト
+        self.phase_times = {}  # フェーズ名をキーとした合計所要時間
+        self.phase_calls = {}  # フェーズ名をキーとしたAPI呼び出し回数
+        self.current_phase = None
+        self.started_at = time.perf_counter()
+
+    def wrap(self, value, label: str):
+        """APIオブジェクト（とそのリスト）をプロキシで包む"""
+        if isinstance(value, API_PLAIN_TYPES) or isinstance(value, ApiProxy):
+            return value
+        if isinstance(value, (list, tuple)):
+            return type(value)(self.wrap(element, label) for element in value)
+        return ApiProxy(value, label, self)
+
+    def record_call(self, method_name: str, elapsed: float):
+        """API呼び出しの所要時間を記録"""
+        self.call_times.setdefault(method_name, []).append(elapsed)
+        phase = self.current_phase or "other"
+        self.phase_calls[phase] = self.phase_calls.get(phase, 0) + 1
+
+    @contextmanager
+    def phase(self, name: str):
+        """ブロックの所要時間をフェーズの時間として加算"""
+        previous_phase = self.current_phase
+        self.current_phase = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_times[name] = self.phase_times.get(name, 0.0) + time.perf_counter() - start
+            self.current_phase = previous_phase
+
+    @staticmethod
+    def _percentile(sorted_times, ratio: float) -> float:
+        """ソート済みの所要時間から百分位数を取得"""
+        return sorted_times[min(len(sorted_times) - 1, int(len(sorted_times) * ratio))]
+
+    def report(self) -> Dict[str, Any]:
+        """計測結果を辞書にまとめる（API呼び出しは合計時間の降順）"""
+        calls = []
+        for method_name, times in self.call_times.items():
+            sorted_times = sorted(times)
+            calls.append({
+                "method": method_name,
+                "count": len(times),
+                "total": sum(times),
+                "p50": self._percentile(sorted_times, 0.50),
+                "p95": self._percentile(sorted_times, 0.95),
+                "max": sorted_times[-1],
+            })
+        calls.sort(key=lambda call: call["total"], reverse=True)
+        return {
+            "wall_time": time.perf_counter() - self.started_at,
+            "total_calls": sum(call["count"] for call in calls),
+            "phases": dict(self.phase_times),
+            "phase_calls": dict(self.phase_calls),
+            "calls": calls,
+        }
+
+    def log_report(self, json_path: Optional[str] = None):
+        """計測結果をログに出力し、指定があればJSONファイルに書き出す"""
+        report = self.report()
+        logging.info(f"計測結果: 全体 {report['wall_time']:.3f}秒, API呼び出し {report['total_calls']}回")
+        for name, elapsed in report["phases"].items():
+            logging.info(f"  フェーズ {name}: {elapsed:.3f}秒, API呼び出し {report['phase_calls'].get(name, 0)}回")
+        for call in report["calls"]:
+            logging.info(f"  {call['method']}: {call['count']}回, 合計 {call['total']:.3f}秒, "
+                         f"p50 {call['p50'] * 1000:.2f}ms, p95 {call['p95'] * 1000:.2f}ms, 最大 {call['max'] * 1000:.2f}ms")
+        if json_path:
+            try:
+                with open(json_path, 'w', encoding='utf-8') as f:
+                    json.dump(report, f, ensure_ascii=False, indent=2)
+                logging.info(f"計測結果を書き出しました: {json_path}")
+            except OSError as e:
+                logging.error(f"計測結果の書き出しに失敗: {json_path}, エラー: {str(e)}")
+
+# 実行中の計測（計測しない場合はNone）
+_profiler: Optional[ApiProfiler] = None
+
+def start_profiling(config: Config) -> Optional[ApiProfiler]:
+    """設定で有効な場合に計測を開始"""
+    global _profiler
+    _profiler = ApiProfiler() if config.is_profiling_enabled() else None
+    return _profiler
+
+@contextmanager
+def profile_phase(name: str):
+    """計測中であればブロックの所要時間をフェーズの時間として記録"""
+    if _profiler is None:
+        yield
+        return
+    with _profiler.phase(name):
+        yield
+
+# クリップごとの処理結果を出力するロガー（JSON Linesの出力が有効な場合のみ有効）
+clip_logger = logging.getLogger("DRSorter.clips")
+clip_logger.propagate = False
+clip_logger.setLevel(logging.CRITICAL + 1)
+
+class AsyncQueueHandler(QueueHandler):
+    """ログレコードを書式化せずにキューへ渡すハンドラ（書式化は書き込み側のスレッドで行う）"""
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 同じプロセス内で受け渡すため文字列化は不要
+        return record
+
+class JsonLinesFormatter(logging.Formatter):
+    """ログレコードを1行のJSONに変換するフォーマッタ"""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "data", None) or {})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+_log_listener: Optional[QueueListener] = None
+
+def setup_logging(config: Config):
+    """設定に応じてログの出力先を構成し、コンソール・ファイルへの書き込みをバックグラウンドのスレッドで開始"""
+    global _log_listener
+    shutdown_logging()
+
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(LOG_FORMAT))
+    console.addFilter(lambda record: record.name != clip_logger.name)
+    handlers = [console]
+    json_path = config.get_log_json_path()
+    if json_path:
+        try:
+            json_handler = logging.FileHandler(json_path, encoding='utf-8')
+            json_handler.setFormatter(JsonLinesFormatter())
+            # クリップ・サマリーの記録と警告以上のログのみ出力（コンソール向けの情報ログは含めない）
+            json_handler.addFilter(lambda record: record.name == clip_logger.name or record.levelno >= logging.WARNING)
+            handlers.append(json_handler)
+        except OSError as e:
+            logging.error(f"JSON Linesのログファイルを開けません: {json_path}, エラー: {str(e)}")
+
+    log_queue = queue.Queue()
+    queue_handler = AsyncQueueHandler(log_queue)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        # 起動時の標準設定のコンソール出力を置き換える
+        if type(handler) is logging.StreamHandler:
+            root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(config.get_log_level())
+    if len(handlers) > 1:
+        clip_logger.addHandler(queue_handler)
+        clip_logger.setLevel(logging.INFO)
+
+    _log_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+
+def shutdown_logging():
+    """キューに残ったログを書き出し、コンソールへの同期出力に戻す"""
+    global _log_listener
+    if _log_listener is None:
+        return
+    listener, _log_listener = _log_listener, None
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+    root = logging.getLogger()
+    for handler in list(root.handlers) + list(clip_logger.handlers):
+        if isinstance(handler, AsyncQueueHandler):
+            root.removeHandler(handler)
+            clip_logger.removeHandler(handler)
+    clip_logger.setLevel(logging.CRITICAL + 1)
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(LOG_FORMAT))
+    root.addHandler(console)
+
+class RunSummary(logging.Handler):
+    """1回の実行の処理件数を集計するクラス（警告・エラーのログを数えるハンドラを兼ねる）"""
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.started = time.perf_counter()
+        self.counts = {}
+
+    def count(self, name: str, amount: int = 1):
+        """件数を加算"""
+        self.counts[name] = self.counts.get(name, 0) + amount
+
+    def emit(self, record: logging.LogRecord):
+        self.count("warnings" if record.levelno < logging.ERROR else "errors")
+
+    def log(self):
+        """集計結果をログとJSON Linesに出力"""
+        elapsed = time.perf_counter() - self.started
+        count = self.counts.get
+        logging.info("実行結果: クリップ %d件 (RAW %d件), タイムライン %d個, PowerGrade 成功 %d件 / 失敗 %d件, "
+                     "基準のないRAW %d件, 警告 %d件, エラー %d件, 所要時間 %.2f秒",
+                     count("clips", 0), count("raw_clips", 0), count("timelines", 0),
+                     count("grade_success", 0), count("grade_failure", 0),
+                     count("orphans", 0), count("warnings", 0), count("errors", 0), elapsed)
+        data = {"type": "summary", "elapsed": round(elapsed, 3)}
+        data.update(self.counts)
+        clip_logger.info("summary", extra={"data": data})
+
+_summary: Optional[RunSummary] = None
+
+def count_event(name: str, amount: int = 1):
+    """集計中であれば実行結果のサマリーに件数を加算"""
+    if _summary is not None:
+        _summary.count(name, amount)
+
+@contextmanager
+def run_summary(store: Optional["CacheStore"] = None):
+    """ブロック内の処理件数を集計し、終了時にサマリーを出力"""
+    global _summary
+    summary = RunSummary()
+    _summary = summary
+    logging.getLogger().addHandler(summary)
+    try:
+        yield summary
+    finally:
+        logging.getLogger().removeHandler(summary)
+        _summary = None
+        if store:
+            summary.count("cache_hits", store.hits)
+            summary.count("cache_misses", store.misses)
+        summary.log()
+
 def get_resolve():
     """DaVinci Resolveのインスタンスを取得"""
     try:
@@ -105,8 +626,8 @@ def get_resolve():
         logging.critical(f"Resolveの取得に失敗: {str(e)}")
         raise
 
-def apply_grade_from_drx_using_graph(item, drx_file_path, grade_mode):
-    """DRXファイルを適用する関数"""
+def apply_grade_from_drx_using_graph(item, drx_file_path, grade_mode, clip_name: Optional[str] = None):
+    """DRXファイルを適用する関数（clip_nameはログ出力用のクリップ名）"""
     if not drx_file_path:
         logging.error("DRXファイルが指定されていません")
         return False
@@ -115,11 +636,11 @@ def apply_grade_from_drx_using_graph(item, drx_file_path, grade_mode):
         # ノードグラフを取得
         graph = item.GetNodeGraph()
         if not graph:
-            logging.error(f"NodeGraphを取得できませんでした: {item.GetName()}")
+            logging.error(f"NodeGraphを取得できませんでした: {clip_name or item.GetName()}")
             return False
 
         # DRXを適用
-        logging.info(f"DRXファイルを適用: {item.GetName()}")
+        logging.debug("DRXファイルを適用: %s", clip_name)
         success = graph.ApplyGradeFromDRX(drx_file_path, grade_mode)
         if not success:
             logging.error(f"DRXの適用に失敗: {drx_file_path}")
@@ -129,289 +650,1725 @@ def apply_grade_from_drx_using_graph(item, drx_file_path, grade_mode):
         logging.error(f"DRX適用中にエラー発生: {str(e)}")
         return False
 
+class CacheStore:
+    """ファイルパス・サイズ・更新日時をキーとした永続メタデータキャッシュ（SQLite）"""
+    SCHEMA_VERSION = 3
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._touched = []  # 最終使用日時を更新するパスのリスト
+        self.connection = sqlite3.connect(path)
+        self._create_tables()
+
+    def _create_tables(self):
+        """テーブルを作成（スキーマが古い場合は作り直す）"""
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != self.SCHEMA_VERSION:
+            self.connection.execute("DROP TABLE IF EXISTS metadata")
+            self.connection.execute("DROP TABLE IF EXISTS checkpoints")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS metadata ("
+            " path TEXT PRIMARY KEY, size INTEGER, mtime REAL, source TEXT,"
+            " camera_type TEXT, lens_type TEXT, last_used REAL)")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT)")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            " folder_key TEXT PRIMARY KEY, run_time TEXT, timeline_names TEXT, pending TEXT, updated_at REAL)")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS placements ("
+            " folder_key TEXT, clip_key TEXT, timeline_name TEXT, resolution TEXT, placed_at REAL,"
+            " PRIMARY KEY (folder_key, clip_key))")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS skipped ("
+            " folder_key TEXT, clip_key TEXT, skipped_at REAL, PRIMARY KEY (folder_key, clip_key))")
+        self.connection.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        self.connection.commit()
+
+    @staticmethod
+    def _stat(file_path: str) -> Optional[Tuple[int, float]]:
+        """ファイルのサイズと更新日時を取得（取得できない場合はNone）"""
+        if not file_path:
+            return None
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime
+
+    def get_metadata(self, file_path: str, source: str) -> Optional[Dict[str, Any]]:
+        """ファイルが変更されておらず同じ取得元で保存したメタデータがあれば返す"""
+        stat = self._stat(file_path)
+        row = None
+        if stat:
+            row = self.connection.execute(
+                "SELECT camera_type, lens_type FROM metadata"
+                " WHERE path = ? AND size = ? AND mtime = ? AND source = ?", (file_path, *stat, source)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touched.append(file_path)
+        return {
+            "camera_type": row[0],
+            "lens_type": row[1],
+        }
+
+    def put_metadata(self, file_path: str, source: str, camera_type: str, lens_type: str):
+        """取得元（"resolve"または"header"）とともにメタデータを保存（ファイル情報が取得できない場合は保存しない）"""
+        stat = self._stat(file_path)
+        if not stat:
+            return
+        self.connection.execute(
+            "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (file_path, stat[0], stat[1], source, camera_type, lens_type, time.time()))
+
+    def get_setting(self, name: str) -> Optional[str]:
+        """実行をまたいで保持する値を取得"""
+        row = self.connection.execute("SELECT value FROM settings WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def put_setting(self, name: str, value: str):
+        """実行をまたいで保持する値を保存"""
+        self.connection.execute("INSERT OR REPLACE INTO settings VALUES (?, ?)", (name, value))
+        self.connection.commit()
+
+    def get_placements(self, folder_key: str) -> Dict[str, Tuple[str, str]]:
+        """フォルダ内の配置済みクリップ（クリップキー → (タイムライン名, 解像度)）を取得"""
+        rows = self.connection.execute(
+            "SELECT clip_key, timeline_name, resolution FROM placements WHERE folder_key = ?",
+            (folder_key,))
+        return {clip_key: (timeline_name, resolution) for clip_key, timeline_name, resolution in rows}
+
+    def get_placement_timelines(self, folder_key: str) -> Dict[str, str]:
+        """解像度ごとに最後にクリップを配置したタイムライン名を取得"""
+        rows = self.connection.execute(
+            "SELECT resolution, timeline_name FROM placements WHERE folder_key = ? ORDER BY placed_at",
+            (folder_key,))
+        return {resolution: timeline_name for resolution, timeline_name in rows}
+
+    def record_placements(self, folder_key: str, timeline_name: str, resolution: str, clip_keys):
+        """クリップを配置したタイムラインを記録"""
+        now = time.time()
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO placements VALUES (?, ?, ?, ?, ?)",
+            [(folder_key, clip_key, timeline_name, resolution, now) for clip_key in clip_keys])
+        self.connection.commit()
+
+    def get_skipped(self, folder_key: str) -> set:
+        """フォルダ内のタイムラインに追加しないと報告済みのクリップキーを取得"""
+        rows = self.connection.execute("SELECT clip_key FROM skipped WHERE folder_key = ?", (folder_key,))
+        return {row[0] for row in rows}
+
+    def record_skipped(self, folder_key: str, clip_keys):
+        """タイムラインに追加しないクリップ（対になるJPEGがないRAW、静止画以外など）を記録"""
+        now = time.time()
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO skipped VALUES (?, ?, ?)",
+            [(folder_key, clip_key, now) for clip_key in clip_keys])
+        self.connection.commit()
+
+    def remove_placements(self, folder_key: str, timeline_names) -> int:
+        """削除されたタイムラインへの配置記録を削除"""
+        removed = self.connection.executemany(
+            "DELETE FROM placements WHERE folder_key = ? AND timeline_name = ?",
+            [(folder_key, name) for name in timeline_names]).rowcount
+        self.connection.commit()
+        return removed
+
+    def get_checkpoint(self, folder_key: str) -> Optional[Tuple[str, list, Dict[str, list]]]:
+        """中断した実行のチェックポイント（実行日時, 作成したタイムライン名のリスト, 追加中だったクリップキー）を取得"""
+        row = self.connection.execute(
+            "SELECT run_time, timeline_names, pending FROM checkpoints WHERE folder_key = ?", (folder_key,)).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), json.loads(row[2] or "{}")
+
+    def save_checkpoint(self, folder_key: str, run_time: str, timeline_names,
+                        pending: Optional[Dict[str, list]] = None):
+        """処理済みのチャンクまでのチェックポイントと、タイムライン名をキーとした追加中のクリップキーを保存"""
+        self.connection.execute(
+            "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?)",
+            (folder_key, run_time, json.dumps(sorted(timeline_names), ensure_ascii=False),
+             json.dumps(pending or {}, ensure_ascii=False), time.time()))
+        self.connection.commit()
+
+    def clear_checkpoint(self, folder_key: str):
+        """完了した実行のチェックポイントを削除"""
+        self.connection.execute("DELETE FROM checkpoints WHERE folder_key = ?", (folder_key,))
+        self.connection.commit()
+
+    def prune(self, max_age_days: float, remove_missing: bool = False) -> int:
+        """一定期間使用されていないエントリ（と変更・削除されたファイルのエントリ）を削除"""
+        self.flush()
+        cutoff = time.time() - max_age_days * 24 * 60 * 60
+        removed = self.connection.execute("DELETE FROM metadata WHERE last_used < ?", (cutoff,)).rowcount
+        if remove_missing:
+            stale = []
+            for path, size, mtime in self.connection.execute("SELECT path, size, mtime FROM metadata"):
+                if self._stat(path) != (size, mtime):
+                    stale.append((path,))
+            self.connection.executemany("DELETE FROM metadata WHERE path = ?", stale)
+            removed += len(stale)
+        self.connection.commit()
+        return removed
+
+    def flush(self):
+        """最終使用日時の更新と保留中の書き込みを確定"""
+        if self._touched:
+            now = time.time()
+            self.connection.executemany(
+                "UPDATE metadata SET last_used = ? WHERE path = ?",
+                [(now, path) for path in self._touched])
+            self._touched = []
+        self.connection.commit()
+
+    def close(self):
+        """キャッシュを保存して閉じる"""
+        self.flush()
+        self.connection.close()
+
+def open_cache_store(config: Config) -> Optional[CacheStore]:
+    """設定に応じて永続メタデータキャッシュを開く（使用しない・開けない場合はNone）"""
+    if not config.is_cache_enabled():
+        return None
+    try:
+        return CacheStore(config.get_cache_path())
+    except sqlite3.Error as e:
+        logging.warning(f"メタデータキャッシュを開けないため使用しません: {config.get_cache_path()}, エラー: {str(e)}")
+        return None
+
+# TIFF/EXIFのタグ
+TIFF_TAG_NEW_SUBFILE_TYPE = 0x00FE
+TIFF_TAG_IMAGE_WIDTH = 0x0100
+TIFF_TAG_IMAGE_LENGTH = 0x0101
+TIFF_TAG_MODEL = 0x0110
+TIFF_TAG_ORIENTATION = 0x0112
+TIFF_TAG_SUB_IFDS = 0x014A
+TIFF_TAG_EXIF_IFD = 0x8769
+EXIF_TAG_PIXEL_X_DIMENSION = 0xA002
+EXIF_TAG_PIXEL_Y_DIMENSION = 0xA003
+EXIF_TAG_LENS_MODEL = 0xA434
+
+# TIFFのデータ型ごとのバイト数
+TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 13: 4}
+
+# ヘッダー読み取りの上限（1エントリ・1IFDあたりの読み取りサイズとIFDの数）
+MAX_TIFF_VALUE_SIZE = 64 * 1024
+MAX_TIFF_ENTRIES = 1024
+MAX_TIFF_IFDS = 32
+
+class TiffHeaderReader:
+    """TIFF構造（DNG等のRAWとJPEGのEXIF）から必要なタグだけを読み取るクラス"""
+    def __init__(self, f, base: int = 0):
+        self.f = f
+        self.base = base
+        byte_order = self._read(0, 8)[:2]
+        if byte_order == b"II":
+            self.endian = "<"
+        elif byte_order == b"MM":
+            self.endian = ">"
+        else:
+            raise ValueError("TIFFヘッダーではありません")
+        self.first_ifd = struct.unpack(self.endian + "I", self._read(4, 4))[0]
+
+    def _read(self, offset: int, size: int) -> bytes:
+        """TIFF先頭からのオフセットを指定して読み取り"""
+        self.f.seek(self.base + offset)
+        data = self.f.read(size)
+        if len(data) < size:
+            raise ValueError("ファイルが途中で終わっています")
+        return data
+
+    def read_ifd(self, offset: int) -> Tuple[Dict[int, Any], int]:
+        """IFDのエントリ（タグ → 値）と次のIFDのオフセットを読み取る"""
+        count = struct.unpack(self.endian + "H", self._read(offset, 2))[0]
+        if count > MAX_TIFF_ENTRIES:
+            raise ValueError(f"IFDのエントリ数が不正です: {count}")
+        data = self._read(offset + 2, count * 12 + 4)
+        entries = {}
+        for index in range(count):
+            tag, value_type, value_count = struct.unpack(self.endian + "HHI", data[index * 12:index * 12 + 8])
+            entries[tag] = (value_type, value_count, data[index * 12 + 8:index * 12 + 12])
+        next_offset = struct.unpack(self.endian + "I", data[count * 12:count * 12 + 4])[0]
+        return entries, next_offset
+
+    def value(self, entry, value_types: Optional[tuple] = None):
+        """エントリの値を取得（文字列は str、数値は int のリスト、value_typesと型が異なる場合はValueError）"""
+        value_type, value_count, raw = entry
+        if value_types and value_type not in value_types:
+            raise ValueError(f"タグの型が不正です: {value_type}")
+        size = TIFF_TYPE_SIZES.get(value_type, 1) * value_count
+        if size > MAX_TIFF_VALUE_SIZE:
+            raise ValueError(f"タグの値が大きすぎます: {size}")
+        if size > 4:
+            raw = self._read(struct.unpack(self.endian + "I", raw)[0], size)
+        if value_type == 2:
+            return raw[:size].split(b"\0", 1)[0].decode("utf-8", "replace").strip()
+        if value_type == 3:
+            return list(struct.unpack(f"{self.endian}{value_count}H", raw[:size]))
+        if value_type in (4, 13):
+            return list(struct.unpack(f"{self.endian}{value_count}I", raw[:size]))
+        return list(raw[:size])
+
+    def text(self, entry) -> Optional[str]:
+        """ASCIIのタグの文字列を取得（空の場合はNone）"""
+        return self.value(entry, (2,)) or None
+
+    def integer(self, entry) -> int:
+        """SHORT・LONGのタグの最初の値を取得"""
+        values = self.value(entry, (3, 4, 13))
+        if not values:
+            raise ValueError("タグの値がありません")
+        return values[0]
+
+    def read_metadata(self) -> Dict[str, Any]:
+        """カメラ・レンズ・最大のメイン画像のサイズ・向きを読み取る"""
+        metadata = {}
+        largest_area = 0
+        pending = [self.first_ifd]
+        visited = set()
+        while pending and len(visited) < MAX_TIFF_IFDS:
+            offset = pending.pop(0)
+            if not offset or offset in visited:
+                continue
+            visited.add(offset)
+            entries, next_offset = self.read_ifd(offset)
+            pending.append(next_offset)
+            if TIFF_TAG_SUB_IFDS in entries:
+                pending.extend(self.value(entries[TIFF_TAG_SUB_IFDS], (4, 13)))
+            if TIFF_TAG_MODEL in entries and "camera_type" not in metadata:
+                camera_type = self.text(entries[TIFF_TAG_MODEL])
+                if camera_type:
+                    metadata["camera_type"] = camera_type
+            if TIFF_TAG_ORIENTATION in entries and "orientation" not in metadata:
+                metadata["orientation"] = self.integer(entries[TIFF_TAG_ORIENTATION])
+            if TIFF_TAG_EXIF_IFD in entries and "exif_offset" not in metadata:
+                metadata["exif_offset"] = self.integer(entries[TIFF_TAG_EXIF_IFD])
+
+            # サムネイル・プレビューを除いた最大の画像をメイン画像とする
+            subfile_type = self.integer(entries[TIFF_TAG_NEW_SUBFILE_TYPE]) if TIFF_TAG_NEW_SUBFILE_TYPE in entries else 0
+            if subfile_type == 0 and TIFF_TAG_IMAGE_WIDTH in entries and TIFF_TAG_IMAGE_LENGTH in entries:
+                width = self.integer(entries[TIFF_TAG_IMAGE_WIDTH])
+                height = self.integer(entries[TIFF_TAG_IMAGE_LENGTH])
+                if width and height and width * height > largest_area:
+                    largest_area = width * height
+                    metadata["width"], metadata["height"] = width, height
+
+        exif_offset = metadata.pop("exif_offset", None)
+        if exif_offset:
+            entries, _ = self.read_ifd(exif_offset)
+            if EXIF_TAG_LENS_MODEL in entries:
+                lens_type = self.text(entries[EXIF_TAG_LENS_MODEL])
+                if lens_type:
+                    metadata["lens_type"] = lens_type
+            if "width" not in metadata and EXIF_TAG_PIXEL_X_DIMENSION in entries and EXIF_TAG_PIXEL_Y_DIMENSION in entries:
+                width = self.integer(entries[EXIF_TAG_PIXEL_X_DIMENSION])
+                height = self.integer(entries[EXIF_TAG_PIXEL_Y_DIMENSION])
+                if width and height:
+                    metadata["width"], metadata["height"] = width, height
+        return metadata
+
+def _read_jpeg_header(f) -> Dict[str, Any]:
+    """JPEGのマーカーを順にたどり、EXIFとSOFだけを読み取る"""
+    metadata = {}
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            raise ValueError("JPEGマーカーが不正です")
+        code = marker[1]
+        if code == 0xFF:
+            f.seek(-1, io.SEEK_CUR)
+            continue
+        if code in (0x01, 0xD8) or 0xD0 <= code <= 0xD7:
+            continue
+        if code in (0xD9, 0xDA):
+            raise ValueError("SOFマーカーが見つかりません")
+        length = struct.unpack(">H", f.read(2))[0]
+        if length < 2:
+            raise ValueError(f"JPEGセグメントの長さが不正です: {length}")
+        if code == 0xE1 and "camera_type" not in metadata:
+            segment = f.read(length - 2)
+            if segment.startswith(b"Exif\0\0"):
+                exif = TiffHeaderReader(io.BytesIO(segment), 6).read_metadata()
+                # EXIFのサイズはサムネイルの場合があるためSOFのサイズを優先
+                exif.pop("width", None)
+                exif.pop("height", None)
+                metadata.update(exif)
+        elif 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">xHH", f.read(5))
+            if not width or not height:
+                raise ValueError("JPEGの画像サイズが不正です")
+            # EXIFの向きが90度回転（5〜8）の場合は表示上の縦横に合わせる
+            if metadata.get("orientation", 1) in (5, 6, 7, 8):
+                width, height = height, width
+            metadata["width"], metadata["height"] = width, height
+            return metadata
+        else:
+            f.seek(length - 2, io.SEEK_CUR)
+
+def read_image_header(file_path: str) -> Optional[Dict[str, Any]]:
+    """画像ファイルのヘッダーだけを読み取り、カメラ・レンズ・解像度を返す（解析できない場合はNone）"""
+    if not file_path:
+        return None
+    try:
+        with open(file_path, "rb") as f:
+            signature = f.read(4)
+            if signature[:2] == b"\xff\xd8":
+                metadata = _read_jpeg_header(f)
+            elif signature[:2] in (b"II", b"MM"):
+                metadata = TiffHeaderReader(f).read_metadata()
+            else:
+                return None
+    except Exception as e:
+        # 壊れたヘッダーで処理全体を止めないよう、解析中のエラーはすべてResolve APIからの取得に切り替える
+        logging.debug("ヘッダーの解析に失敗: %s, エラー: %s", file_path, e)
+        return None
+    metadata.pop("orientation", None)
+    return metadata
+
+class HeaderMetadataReader:
+    """スレッドプールで画像ファイルのヘッダーを先読みするメタデータ取得クラス"""
+    def __init__(self, max_workers: int = 8):
+        self.max_workers = max_workers
+        self.results = {}  # ファイルパスをキーとした解析結果（解析できない場合はNone）
+
+    def read_all(self, file_paths) -> Dict[str, Optional[Dict[str, Any]]]:
+        """未解析のファイルを並列に解析し、ファイルパスをキーとした解析結果を返す"""
+        targets = [path for path in set(file_paths) if path and path not in self.results]
+        if targets:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                for path, metadata in zip(targets, executor.map(read_image_header, targets)):
+                    self.results[path] = metadata
+        return {path: self.results.get(path) for path in file_paths}
+
+def create_header_reader(config: Config) -> Optional[HeaderMetadataReader]:
+    """設定でヘッダーからの取得が指定されている場合にヘッダー読み取りを作成"""
+    if config.get_metadata_source() != "header":
+        return None
+    return HeaderMetadataReader(config.get_header_workers())
+
+# スナップショットで保持するクリッププロパティ（一括取得できない場合の個別取得対象）
+SNAPSHOT_PROPERTIES = ("Clip Name", "Format", "Type", "Resolution", "File Path")
+
+# 拡張子ごとの静止画の形式
+STILL_FORMAT_EXTENSIONS = {
+    ".jpg": "jpeg", ".jpeg": "jpeg",
+    ".heif": "heif", ".heic": "heif", ".hif": "heif",
+    ".dng": "dng", ".arw": "arw", ".cr3": "cr3", ".nef": "nef",
+    ".raf": "raf", ".orf": "orf", ".rw2": "rw2",
+}
+
+# ペアの基準（解像度・メタデータの取得元）とする形式のデフォルトの優先順
+DEFAULT_PRIMARY_FORMATS = ("jpeg", "heif")
+
+# ペアの相手（PowerGrade・スケールの適用先）とするRAW形式のデフォルトの優先順
+DEFAULT_RAW_FORMATS = ("dng", "arw", "cr3", "nef", "raf", "orf", "rw2")
+
+# 写真の向き
+ORIENTATION_LANDSCAPE = "landscape"
+ORIENTATION_PORTRAIT = "portrait"
+ORIENTATION_SQUARE = "square"
+
+def parse_resolution(resolution: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """"WxH"形式の解像度文字列を幅と高さに変換（解析できない場合はNone）"""
+    try:
+        width, height = map(int, resolution.split('x'))
+        return width, height
+    except (AttributeError, ValueError):
+        return None, None
+
+class ClipSnapshot:
+    """メディアプールアイテムのプロパティを一度だけ取得して保持するレコード"""
+    __slots__ = ("item", "clip_name", "base_name", "format", "still_format", "type",
+                 "file_path", "resolution", "width", "height", "orientation")
+
+    def __init__(self, item, properties: Dict[str, Any]):
+        self.item = item
+        self.clip_name = properties.get("Clip Name") or ""
+        self.base_name = os.path.splitext(self.clip_name)[0]
+        self.format = properties.get("Format") or ""
+        # 形式は拡張子で判別し、判別できない場合はFormatプロパティを使用
+        self.still_format = STILL_FORMAT_EXTENSIONS.get(os.path.splitext(self.clip_name)[1].lower()) \
+            or STILL_FORMAT_EXTENSIONS.get("." + self.format.lower())
+        self.type = properties.get("Type") or ""
+        self.file_path = properties.get("File Path") or ""
+        self.set_resolution(*parse_resolution(properties.get("Resolution")))
+        if not self.resolution:
+            self.resolution = properties.get("Resolution") or ""
+
+    def set_resolution(self, width: Optional[int], height: Optional[int]):
+        """解像度と向きを設定"""
+        self.width, self.height = width, height
+        self.resolution = f"{width}x{height}" if width is not None else ""
+        if self.width is None:
+            self.orientation = None
+        elif self.width > self.height:
+            self.orientation = ORIENTATION_LANDSCAPE
+        elif self.width < self.height:
+            self.orientation = ORIENTATION_PORTRAIT
+        else:
+            self.orientation = ORIENTATION_SQUARE
+
+    @property
+    def key(self) -> str:
+        """クリップを識別するキー（ファイルパス、取得できない場合はクリップ名）"""
+        return self.file_path or self.clip_name
+
+    @property
+    def is_jpeg(self) -> bool:
+        return self.still_format == "jpeg"
+
+    @property
+    def is_raw(self) -> bool:
+        return self.still_format in DEFAULT_RAW_FORMATS
+
+def take_clip_snapshot(item) -> ClipSnapshot:
+    """GetClipProperty()の一括取得でメディアプールアイテムのスナップショットを作成"""
+    properties = None
+    try:
+        properties = item.GetClipProperty()
+    except Exception as e:
+        logging.warning(f"クリッププロパティの一括取得に失敗: {str(e)}")
+    if not isinstance(properties, dict) or not properties:
+        # 一括取得できない場合は必要なプロパティのみ個別に取得
+        properties = {key: item.GetClipProperty(key) for key in SNAPSHOT_PROPERTIES}
+    return ClipSnapshot(item, properties)
+
+def pairing_key(snapshot: ClipSnapshot, match_directory: bool = False) -> str:
+    """ペアを判定するキー（ベース名、match_directoryの場合はフォルダ込みのベース名）を作成"""
+    if match_directory and snapshot.file_path:
+        return os.path.join(os.path.dirname(snapshot.file_path), snapshot.base_name)
+    return snapshot.base_name
+
+class PairingIndex:
+    """ペアのキーごとに同じ写真の各形式のスナップショットを1回の走査でまとめる索引"""
+    def __init__(self, snapshots, match_directory: bool = False):
+        self.match_directory = match_directory
+        self.groups = {}      # ペアのキーをキーとした{形式: スナップショット}
+        self.keys = {}        # スナップショットのidをキーとしたペアのキー
+        self.rekeyed = 0      # 別のフォルダに同じベース名があるためフォルダごとに区別したベース名の数
+        self.unpaired = []    # 同じフォルダでペアのキーと形式が重複したためペアにしないスナップショット
+        candidates = {}
+        for snapshot in snapshots:
+            if snapshot.still_format:
+                candidates.setdefault(pairing_key(snapshot, match_directory), []).append(snapshot)
+        for key, members in candidates.items():
+            if (not match_directory and len({snapshot.still_format for snapshot in members}) < len(members)
+                    and len({os.path.dirname(snapshot.file_path) for snapshot in members}) > 1):
+                # 別のフォルダの同じベース名のファイルが重複する場合はこのベース名だけフォルダごとに区別
+                self.rekeyed += 1
+                for snapshot in members:
+                    self._add(pairing_key(snapshot, True), snapshot)
+            else:
+                for snapshot in members:
+                    self._add(key, snapshot)
+
+    def _add(self, key: str, snapshot: ClipSnapshot):
+        """スナップショットをペアのキーのグループに追加（形式が重複する場合は単独のグループにする）"""
+        if snapshot.still_format in self.groups.get(key, {}):
+            self.unpaired.append(snapshot)
+            key = snapshot.key
+            while key in self.groups:
+                key += "/"
+        self.groups.setdefault(key, {})[snapshot.still_format] = snapshot
+        self.keys[id(snapshot)] = key
+
+    def key(self, snapshot: ClipSnapshot) -> str:
+        """スナップショットのペアのキーを取得"""
+        return self.keys.get(id(snapshot)) or pairing_key(snapshot, self.match_directory)
+
+    @staticmethod
+    def select(formats: Dict[str, ClipSnapshot], order) -> Optional[ClipSnapshot]:
+        """優先順で最初に見つかった形式のスナップショットを取得"""
+        return next((formats[f] for f in order if f in formats), None)
+
+    def pair(self, key: str, config: Config, camera_type: Optional[str]) -> Optional[tuple]:
+        """カメラに応じた(基準のスナップショット, RAWのスナップショット)を選択（基準が見つからない場合はNone）"""
+        formats = self.groups[key]
+        primary_formats, raw_formats = config.get_pairing_formats(camera_type)
+        primary = self.select(formats, primary_formats)
+        if not primary:
+            return None
+        return primary, self.select(formats, raw_formats)
+
 class MediaItemCache:
     """メディアアイテムとメタデータのキャッシュを管理するクラス"""
-    def __init__(self, media_items):
-        self.metadata_cache = {}  # ベース名をキーとしたメタデータのキャッシュ
-        self.dng_cache = {}      # ベース名をキーとしたDNGアイテムのキャッシュ
-        self.jpeg_cache = {}     # ベース名をキーとしたJPEGアイテムのキャッシュ
-        self._build_cache(media_items)
-
-    def _build_cache(self, media_items):
-        """メディアアイテムのキャッシュを構築"""
-        for item in media_items:
-            base_name = os.path.splitext(item.GetClipProperty("Clip Name"))[0]
-            format_type = item.GetClipProperty("Format")
-            
-            if format_type == "JPEG":
-                self.jpeg_cache[base_name] = item
-                # JPEGファイルからメタデータを取得してキャッシュ
-                try:
-                    camera_type = item.GetMetadata("Camera TC Type")
-                    lens_type = item.GetMetadata("Lens Type")
-                    
-                    # メタデータが取得できない場合はデフォルト値を使用
-                    if not camera_type:
-                        camera_type = "default"
-                        logging.info(f"Camera TC Typeが取得できないためデフォルト使用: {base_name}")
-                    if not lens_type:
-                        lens_type = "default"
-                        logging.info(f"Lens Typeが取得できないためデフォルト使用: {base_name}")
-                        
-                    self.metadata_cache[base_name] = {
-                        "camera_type": camera_type,
-                        "lens_type": lens_type
-                    }
-                    logging.info(f"メタデータをキャッシュ: {base_name} - Camera: {camera_type}, Lens: {lens_type}")
-                    
-                except Exception as e:
-                    logging.error(f"メタデータの取得に失敗: {base_name}, エラー: {str(e)}")
-                    # エラー時もデフォルト値を設定
-                    self.metadata_cache[base_name] = {
-                        "camera_type": "default",
-                        "lens_type": "default"
+    def __init__(self, snapshots, config: Config, store: Optional[CacheStore] = None,
+                 header_reader: Optional[HeaderMetadataReader] = None, match_directory: bool = False):
+        self.config = config
+        self.index = PairingIndex(snapshots, match_directory or config.should_pair_by_directory())
+        self.metadata_cache = {}  # ペアのキーをキーとしたメタデータのキャッシュ
+        self.pairs = {}           # ペアのキーをキーとした(基準のスナップショット, RAWのスナップショット)
+        self.orphans = []         # ペアの基準となる形式が見つからないRAWのスナップショット
+        self.unselected = []      # 同じ写真の別の形式が選ばれたためタイムラインに追加しないスナップショット
+        self.store = store        # 永続メタデータキャッシュ
+        self.header_reader = header_reader  # 画像ファイルのヘッダー読み取り
+        # 取得元によってカメラ名の表記が異なるため永続キャッシュは取得元ごとに区別する
+        self.source = "header" if header_reader else "resolve"
+        self._build_cache()
+
+    def _build_cache(self):
+        """ペアの索引からメタデータのキャッシュとペアを構築"""
+        default_primary_formats, _ = self.config.get_pairing_formats(None)
+        primaries = {}  # ペアのキーをキーとしたメタデータ取得元のスナップショット
+        for key, formats in self.index.groups.items():
+            primary = PairingIndex.select(formats, default_primary_formats)
+            if primary:
+                primaries[key] = primary
+            else:
+                self.orphans.extend(snapshot for snapshot in formats.values() if snapshot.is_raw)
+
+        pending = []
+        for key, snapshot in primaries.items():
+            # 前回以降変更されていないファイルは永続キャッシュのメタデータを使用
+            if self.store:
+                record = self.store.get_metadata(snapshot.file_path, self.source)
+                if record:
+                    self.metadata_cache[key] = {
+                        "camera_type": record["camera_type"],
+                        "lens_type": record["lens_type"]
                     }
+                    continue
+            pending.append((key, snapshot))
+
+        # ヘッダー読み取りが有効な場合は未取得のファイルをまとめて並列に解析
+        headers = {}
+        if self.header_reader:
+            headers = self.header_reader.read_all([snapshot.file_path for _, snapshot in pending])
+
+        for key, snapshot in pending:
+            header = headers.get(snapshot.file_path) or {}
+            if snapshot.width is None and header.get("width"):
+                snapshot.set_resolution(header["width"], header["height"])
+            # ファイルからメタデータを取得してキャッシュ（ヘッダーから取得できなかった項目はResolve APIを使用）
+            try:
+                camera_type = header.get("camera_type") or snapshot.item.GetMetadata("Camera TC Type")
+                lens_type = header.get("lens_type") or snapshot.item.GetMetadata("Lens Type")
+                self._remember(key, snapshot, camera_type, lens_type)
+                
+            except Exception as e:
+                logging.error("メタデータの取得に失敗: %s, エラー: %s", key, e)
+                # エラー時もデフォルト値を設定
+                self.metadata_cache[key] = {
+                    "camera_type": "default",
+                    "lens_type": "default"
+                }
+
+        # カメラごとの形式の優先順でペアを決定
+        for key, primary in primaries.items():
+            camera_type = self.metadata_cache[key]["camera_type"]
+            pair = self.index.pair(key, self.config, camera_type) or (primary, None)
+            self.pairs[key] = pair
+            self.unselected.extend(snapshot for snapshot in self.index.groups[key].values() if snapshot not in pair)
+        self._report()
+
+    def _report(self):
+        """ペアの集計と、ペアにならなかったファイルを報告"""
+        paired = sum(1 for _, raw in self.pairs.values() if raw)
+        count_event("orphans", len(self.orphans))
+        count_event("unpaired", len(self.index.unpaired))
+        count_event("unselected", len(self.unselected))
+        logging.info(f"ペア: {paired}組, RAWなし: {len(self.pairs) - paired}件, "
+                     f"基準のファイルがないRAW: {len(self.orphans)}件")
+        if self.orphans:
+            logging.warning(f"ペアの基準となるファイル（JPEG・HEIF）が見つからないRAWはタイムラインに追加しません: "
+                            f"{len(self.orphans)}件")
+            for snapshot in self.orphans:
+                logging.debug("ペアの基準となるファイルが見つかりません: %s", snapshot.clip_name)
+        if self.index.rekeyed:
+            logging.warning(f"別のフォルダに同じ名前のファイルがあるため、フォルダごとにペアを判定しました: "
+                            f"{self.index.rekeyed}件（pairing.match_directory を有効にすると常にフォルダごとに判定します）")
+        if self.index.unpaired:
+            logging.warning(f"同じフォルダで名前と形式が重複しているため、ペアにせずに追加するファイル: "
+                            f"{len(self.index.unpaired)}件")
+            for snapshot in self.index.unpaired:
+                logging.debug("ペアのキーが重複しています: %s", snapshot.key)
+        if self.unselected:
+            logging.warning(f"同じ写真の別の形式（JPEGとHEIF、複数のRAWなど）を優先したためタイムラインに追加しないファイル: "
+                            f"{len(self.unselected)}件")
+            for snapshot in self.unselected:
+                logging.debug("同じ写真の別の形式を優先しました: %s", snapshot.key)
+
+    def _remember(self, key: str, snapshot: ClipSnapshot,
+                  camera_type: Optional[str], lens_type: Optional[str]):
+        """取得したメタデータをキャッシュと永続キャッシュに保存"""
+        # 取り込み直後などResolveがまだ値を返さない場合があるため、取得できた値のみ永続キャッシュに保存
+        persist = bool(camera_type and lens_type)
+        # メタデータが取得できない場合はデフォルト値を使用
+        if not camera_type:
+            camera_type = "default"
+            count_event("metadata_defaults")
+            logging.debug("Camera TC Typeが取得できないためデフォルト使用: %s", key)
+        if not lens_type:
+            lens_type = "default"
+            logging.debug("Lens Typeが取得できないためデフォルト使用: %s", key)
             
-            elif format_type.lower() == "dng":
-                self.dng_cache[base_name] = item
+        self.metadata_cache[key] = {
+            "camera_type": camera_type,
+            "lens_type": lens_type
+        }
+        logging.debug("メタデータをキャッシュ: %s - Camera: %s, Lens: %s", key, camera_type, lens_type)
+        
+        if self.store and persist:
+            self.store.put_metadata(snapshot.file_path, self.source, camera_type, lens_type)
 
-    def get_metadata(self, base_name: str) -> Dict[str, Optional[str]]:
+    def get_metadata(self, key: str) -> Dict[str, Optional[str]]:
         """キャッシュからメタデータを取得"""
-        return self.metadata_cache.get(base_name, {"camera_type": None, "lens_type": None})
-
-    def get_dng_and_metadata(self, media_item) -> tuple:
-        """メディアアイテムに対応するDNGアイテムとメタデータを取得"""
-        base_name = os.path.splitext(media_item.GetClipProperty("Clip Name"))[0]
-        dng_item = self.dng_cache.get(base_name)
-        metadata = self.get_metadata(base_name)
-        return dng_item, metadata
-
-def set_timeline_resolution(project, timeline, width, height, config): # config を引数に追加
-    """タイムラインの解像度とカラー設定を設定する"""
-    # タイムライン解像度設定
-    timeline.SetSetting("useCustomSettings", "1")
-    timeline.SetSetting("timelineResolutionWidth", str(width))
-    timeline.SetSetting("timelineResolutionHeight", str(height))
-    timeline.SetSetting("timelineOutputResolutionWidth", str(width))
-    timeline.SetSetting("timelineOutputResolutionHeight", str(height))
-
-    # カラーマネジメント設定の適用
-    timeline.SetSetting("isAutoColorManage", "0")
-    
-    color_settings_to_copy = [
-        "colorScienceMode",
-        "rcmPresetMode",
-        "colorSpaceOutput"
-    ]
+        return self.metadata_cache.get(key, {"camera_type": None, "lens_type": None})
 
-    logging.info(f"タイムライン '{timeline.GetName()}' にカラー設定を適用しています...")
-    
-    if config.should_force_color_settings():
-        # 設定ファイルの値を強制使用
-        logging.info("設定ファイルのカラー設定を強制適用します...")
-        all_color_settings_applied = True
-        for setting_name in color_settings_to_copy:
-            config_value = config.get_color_setting(setting_name)
-            if config_value is not None:
-                logging.info(f"  設定ファイル '{setting_name}': {config_value}")
-                if timeline.SetSetting(setting_name, config_value):
-                    logging.info(f"    -> タイムライン設定 '{setting_name}' に適用しました。")
+    def get_pair(self, snapshot: ClipSnapshot) -> tuple:
+        """スナップショットが属する(基準のスナップショット, RAWのスナップショット)を取得"""
+        return self.pairs.get(self.index.key(snapshot), (None, None))
+
+    def get_raw_and_metadata(self, snapshot: ClipSnapshot) -> tuple:
+        """スナップショットに対応するRAWスナップショットとメタデータを取得"""
+        key = self.index.key(snapshot)
+        _, raw_snapshot = self.pairs.get(key, (None, None))
+        return raw_snapshot, self.get_metadata(key)
+
+def group_by_resolution(media_cache: MediaItemCache, config: Config) -> Dict[str, list]:
+    """ペアの基準（JPEG・HEIF）の解像度でスナップショットをグループ化し、対応するRAWを同じグループに追加"""
+    resolution_groups = {}
+    still_type = config.get_still_type()
+    for snapshot, raw_snapshot in media_cache.pairs.values():
+        if snapshot.type != still_type:
+            continue
+        if snapshot.width is None:
+            logging.error("解像度の解析に失敗: %s", snapshot.resolution)
+            continue
+        group = resolution_groups.setdefault(snapshot.resolution, [])
+        group.append(snapshot)
+        # ペアの索引でRAWは1つのペアにだけ属するため重複の確認は不要
+        if raw_snapshot:
+            group.append(raw_snapshot)
+    return resolution_groups
+
+def build_timeline_clip_list(snapshots, pair_key=None) -> list:
+    """ペアのキー・クリップ名順にソートし、同じファイルの重複を除いたタイムライン用のリストを作成
+
+    pair_keyにはスナップショットのペアのキーを返す関数を指定し、フォルダごとにペアを判定する場合も同じ写真の形式が隣り合うようにする
+    """
+    added_keys = set()
+    clip_list = []
+    for snapshot in sorted(snapshots, key=lambda x: (pair_key(x) if pair_key else "", x.clip_name, x.key)):
+        if snapshot.key not in added_keys:
+            added_keys.add(snapshot.key)
+            clip_list.append(snapshot)
+    return clip_list
+
+def append_clips_to_timeline(media_pool, clip_list, chunk_size: int) -> list:
+    """クリップをまとめてタイムラインに追加し、(タイムラインアイテム, スナップショット)のリストを返す"""
+    appended = []
+    for start in range(0, len(clip_list), chunk_size):
+        chunk = clip_list[start:start + chunk_size]
+        timeline_items = media_pool.AppendToTimeline([snapshot.item for snapshot in chunk])
+        if timeline_items and len(timeline_items) == len(chunk):
+            # 追加したクリップと同じ順序でタイムラインアイテムが返される
+            appended.extend(zip(timeline_items, chunk))
+        elif timeline_items:
+            # 一部のクリップが追加されなかった場合は名前で対応付け
+            logging.warning(f"タイムラインに追加できなかったクリップがあります: {len(chunk) - len(timeline_items)}件")
+            snapshots_by_name = {snapshot.clip_name: snapshot for snapshot in chunk}
+            for timeline_item in timeline_items:
+                snapshot = snapshots_by_name.get(timeline_item.GetName())
+                if snapshot:
+                    appended.append((timeline_item, snapshot))
+        else:
+            # 一括追加に失敗した場合は1クリップずつ追加
+            logging.warning("クリップの一括追加に失敗したため1件ずつ追加します")
+            for snapshot in chunk:
+                timeline_items = media_pool.AppendToTimeline([snapshot.item])
+                if timeline_items:
+                    appended.append((timeline_items[0], snapshot))
                 else:
-                    logging.error(f"    -> エラー: タイムライン設定 '{setting_name}' の適用に失敗しました。")
-                    all_color_settings_applied = False
+                    logging.error("タイムラインへの追加に失敗: %s", snapshot.clip_name)
+    return appended
+
+def apply_grades_by_group(timeline, grade_groups: Dict[str, list], grade_mode: int,
+                          config: Config) -> Dict[str, Dict[str, int]]:
+    """PowerGradeのパスごとにまとめてDRXを適用し、グループごとの成功・失敗件数と失敗したクリップのキーを返す"""
+    results = {}
+    for power_grade_path, items in grade_groups.items():
+        result = {"success": 0, "failure": 0, "failed": []}
+        results[power_grade_path] = result
+        if not config.power_grade_exists(power_grade_path):
+            logging.error(f"PowerGradeファイルが存在しません: {power_grade_path}")
+            result["failure"] = len(items)
+            result["failed"] = [snapshot.key for _, snapshot in items]
+            continue
+
+        logging.info(f"PowerGrade適用開始: {power_grade_path} ({len(items)}件)")
+        # タイムラインの複数アイテム一括適用を優先して使用
+        try:
+            applied = timeline.ApplyGradeFromDRX(power_grade_path, grade_mode, [item for item, _ in items])
+        except Exception as e:
+            logging.warning(f"DRXの一括適用中にエラー発生: {str(e)}")
+            applied = False
+
+        if applied:
+            result["success"] = len(items)
+        else:
+            # 一括適用できない場合はアイテムごとに1回だけ適用
+            logging.warning(f"DRXの一括適用に失敗したためアイテムごとに適用します: {power_grade_path}")
+            for item, snapshot in items:
+                if apply_grade_from_drx_using_graph(item, power_grade_path, grade_mode, snapshot.clip_name):
+                    result["success"] += 1
+                else:
+                    logging.error("PowerGrade適用失敗: %s", snapshot.clip_name)
+                    result["failure"] += 1
+                    result["failed"].append(snapshot.key)
+
+        logging.info(f"PowerGrade適用結果: {power_grade_path} - 成功: {result['success']}, 失敗: {result['failure']}")
+    return results
+
+def apply_raw_transform(item, snapshot: ClipSnapshot, media_cache: MediaItemCache,
+                        config: Config) -> Tuple[Optional[float], Optional[float]]:
+    """対応するJPEGの縦横比からRAWのスケールと回転を設定し、(スケール, 回転角度)を返す"""
+    jpeg_snapshot, _ = media_cache.get_pair(snapshot)
+    rotation = None
+    
+    if jpeg_snapshot and jpeg_snapshot.width and snapshot.width:
+        # JPEGとDNGの解像度はスナップショットから取得
+        jpeg_width = jpeg_snapshot.width
+        dng_width = snapshot.width
+        
+        if jpeg_snapshot.orientation == ORIENTATION_LANDSCAPE:  # 横写真の場合
+            # 縦写真と同じ統一計算式を使用
+            scale = dng_width / jpeg_width
+        elif jpeg_snapshot.orientation == ORIENTATION_PORTRAIT:  # 縦写真の場合
+            # DNGの幅をJPEGの幅で割る統一計算式
+            scale = dng_width / jpeg_width
+            rotation = config.get_rotation_angle()
+            item.SetProperty("RotationAngle", rotation)
+        else:  # 正方形（1:1アスペクト比）の場合
+            # 回転処理なし、スケール調整のみ
+            # 正方形の場合はDNGをJPEGの解像度に合わせる
+            scale = dng_width / jpeg_width
+        
+        item.SetProperty("ZoomX", scale)
+        item.SetProperty("ZoomY", scale)  # Y軸にも同じスケールを適用
+        return scale, rotation
+    logging.warning("対応するJPEGファイルが見つかりません: %s", snapshot.base_name)
+    count_event("missing_pairs")
+    return None, None
+
+def process_timeline_items(timeline, timeline_items, media_cache: MediaItemCache, config: Config):
+    """RAWのタイムラインアイテムにスケール・PowerGrade・Distortionを設定"""
+    grade_groups = {}   # PowerGradeのパスをキーとした(タイムラインアイテム, スナップショット)のリスト
+    distortions = []    # (タイムラインアイテム, Distortion値)のリスト
+    # JSON Linesの出力が有効な場合のみクリップごとの処理結果を記録
+    records = [] if clip_logger.isEnabledFor(logging.INFO) else None
+    count_event("clips", len(timeline_items))
+    with profile_phase("scaling"):
+        for item, snapshot in timeline_items:
+            raw_snapshot, metadata = media_cache.get_raw_and_metadata(snapshot)
+            if raw_snapshot is not snapshot:
+                if records is not None:
+                    records.append(clip_record(snapshot, metadata))
+                continue
+            logging.debug("RAWファイル %s のメタデータ処理開始", snapshot.clip_name)
+            count_event("raw_clips")
+            
+            power_grade_path, distortion = config.get_clip_settings(metadata["camera_type"], metadata["lens_type"])
+            if power_grade_path:
+                grade_groups.setdefault(power_grade_path, []).append((item, snapshot))
+            
+            if distortion is not None:
+                distortions.append((item, distortion))
+            
+            scale, rotation = apply_raw_transform(item, snapshot, media_cache, config)
+            if records is not None:
+                record = clip_record(snapshot, metadata)
+                record.update({"power_grade": power_grade_path, "grade_applied": bool(power_grade_path),
+                               "scale": scale, "rotation": rotation, "distortion": distortion})
+                if scale is None:
+                    record["errors"].append("対応するJPEGファイルが見つかりません")
+                records.append(record)
+
+    # カメラごとのPowerGradeをグループ単位で1回ずつ適用
+    with profile_phase("grading"):
+        results = apply_grades_by_group(timeline, grade_groups, 0, config)
+    failed = set()
+    for result in results.values():
+        count_event("grade_success", result["success"])
+        count_event("grade_failure", result["failure"])
+        failed.update(result["failed"])
+
+    with profile_phase("scaling"):
+        for item, distortion in distortions:
+            item.SetProperty("Distortion", distortion)
+
+    if records is not None:
+        timeline_name = timeline.GetName()
+        for record in records:
+            record["timeline"] = timeline_name
+            if record["path"] in failed:
+                record["grade_applied"] = False
+                record["errors"].append("PowerGrade適用失敗")
+            clip_logger.info("clip", extra={"data": record})
+
+def clip_record(snapshot: ClipSnapshot, metadata: Dict[str, Optional[str]]) -> Dict[str, Any]:
+    """JSON Linesに出力するクリップごとの処理結果を作成"""
+    return {
+        "type": "clip",
+        "clip": snapshot.clip_name,
+        "path": snapshot.key,
+        "format": snapshot.still_format,
+        "resolution": snapshot.resolution,
+        "camera": metadata["camera_type"],
+        "lens": metadata["lens_type"],
+        "power_grade": None,
+        "grade_applied": None,
+        "scale": None,
+        "rotation": None,
+        "distortion": None,
+        "errors": [],
+    }
+
+def get_folder_key(project, folder) -> str:
+    """配置記録に使用するプロジェクトとフォルダの識別キーを作成"""
+    return f"{project.GetName()}/{folder.GetUniqueId()}"
+
+def find_folder_by_path(root_folder, path: str):
+    """メディアプールのルートからの"/"区切りのパスでフォルダを検索"""
+    names = [name for name in path.replace("\\", "/").split("/") if name]
+    if names and names[0] == root_folder.GetName():
+        names = names[1:]
+    folder = root_folder
+    for name in names:
+        folder = next((sub for sub in folder.GetSubFolderList() or [] if sub.GetName() == name), None)
+        if not folder:
+            return None
+    return folder
+
+def walk_folders(folder, label: str) -> list:
+    """フォルダとそのサブフォルダを深さ優先でたどり、(ラベル, フォルダ)のリストを返す"""
+    folders = [(label, folder)]
+    for sub in folder.GetSubFolderList() or []:
+        folders.extend(walk_folders(sub, f"{label}/{sub.GetName()}"))
+    return folders
+
+def collect_batch_folders(media_pool, config: "Config") -> list:
+    """バッチモードで処理するフォルダを(ラベル, フォルダ)のリストで取得"""
+    paths = config.get_batch_folders()
+    if paths:
+        root_folder = media_pool.GetRootFolder()
+        starts = []
+        for path in paths:
+            folder = find_folder_by_path(root_folder, path)
+            if folder:
+                starts.append((path.strip("/"), folder))
             else:
-                logging.warning(f"  警告: 設定ファイル '{setting_name}' が設定されていません。スキップします。")
+                logging.error(f"ビンが見つかりません: {path}")
     else:
-        # プロジェクト設定を優先使用
-        logging.info("プロジェクトのカラー設定を適用します...")
-        all_color_settings_applied = True
-        for setting_name in color_settings_to_copy:
-            project_setting_value = project.GetSetting(setting_name)
-            if project_setting_value is not None:
-                logging.info(f"  プロジェクト設定 '{setting_name}': {project_setting_value}")
-                if timeline.SetSetting(setting_name, project_setting_value):
-                    logging.info(f"    -> タイムライン設定 '{setting_name}' に適用しました。")
+        folder = media_pool.GetCurrentFolder()
+        starts = [(folder.GetName(), folder)] if folder else []
+
+    folders = []
+    seen = set()
+    for label, folder in starts:
+        for sub_label, sub in walk_folders(folder, label) if config.is_batch_recursive() else [(label, folder)]:
+            folder_id = sub.GetUniqueId()
+            if folder_id not in seen:
+                seen.add(folder_id)
+                folders.append((sub_label, sub))
+    return folders
+
+def find_timelines_by_name(project) -> Dict[str, Any]:
+    """プロジェクト内のタイムラインを名前で引ける辞書を作成"""
+    timelines = {}
+    for index in range(1, project.GetTimelineCount() + 1):
+        timeline = project.GetTimelineByIndex(index)
+        if timeline:
+            timelines[timeline.GetName()] = timeline
+    return timelines
+
+def select_unplaced_snapshots(snapshots, placed: Dict[str, Tuple[str, str]], match_directory: bool = False,
+                              skipped: Optional[set] = None) -> list:
+    """未配置・未報告のクリップを含むペアのスナップショットだけを抽出（ペアの判定に配置済みの相手も含める）"""
+    skipped = skipped or set()
+    new_keys = {pairing_key(snapshot, match_directory) for snapshot in snapshots
+                if snapshot.key not in placed and snapshot.key not in skipped}
+    return [snapshot for snapshot in snapshots if pairing_key(snapshot, match_directory) in new_keys]
+
+# タイムラインにコピーするカラー設定
+COLOR_SETTINGS_TO_COPY = ("colorScienceMode", "rcmPresetMode", "colorSpaceOutput")
+
+# プロジェクト設定優先時に出力カラースペースとして試すsRGBの表記（Resolveのバージョンにより異なる）
+SRGB_VARIANTS = ("sRGB", "sRGB (D65)", "sRGB D65")
+
+# 受け付けられたsRGBの表記を永続キャッシュに保存する際の名前
+SRGB_VARIANT_SETTING = "srgb_color_space_output"
+
+class TimelineSettingsApplier:
+    """タイムラインの解像度・カラー設定を計算し、現在値との差分だけを適用するクラス
+
+    プロジェクト設定の読み取りは1回の実行につき1回だけ行い、
+    受け付けられた出力カラースペースのsRGB表記は永続キャッシュに保存して次回以降の試行を省略します。
+    """
+    def __init__(self, project, config: Config, store: Optional[CacheStore] = None):
+        self.project = project
+        self.config = config
+        self.store = store
+        self._color_settings = None  # タイムラインに適用するカラー設定（初回の適用時に作成）
+        self._srgb_variant = store.get_setting(SRGB_VARIANT_SETTING) if store else None
+
+    def _get_color_settings(self) -> Dict[str, str]:
+        """設定ファイルまたはプロジェクト設定からタイムラインに適用するカラー設定を作成"""
+        if self._color_settings is not None:
+            return self._color_settings
+
+        color_settings = {}
+        if self.config.should_force_color_settings():
+            # 設定ファイルの値を強制使用
+            logging.info("設定ファイルのカラー設定を強制適用します...")
+            for setting_name in COLOR_SETTINGS_TO_COPY:
+                config_value = self.config.get_color_setting(setting_name)
+                if config_value is not None:
+                    color_settings[setting_name] = str(config_value)
+                else:
+                    logging.warning(f"  警告: 設定ファイル '{setting_name}' が設定されていません。スキップします。")
+        else:
+            # プロジェクト設定を優先使用（まとめて1回で取得）
+            logging.info("プロジェクトのカラー設定を適用します...")
+            project_settings = self.project.GetSetting()
+            if not isinstance(project_settings, dict):
+                project_settings = {name: self.project.GetSetting(name) for name in COLOR_SETTINGS_TO_COPY}
+            for setting_name in COLOR_SETTINGS_TO_COPY:
+                project_setting_value = project_settings.get(setting_name)
+                if project_setting_value is not None:
+                    color_settings[setting_name] = str(project_setting_value)
                 else:
-                    logging.error(f"    -> エラー: タイムライン設定 '{setting_name}' の適用に失敗しました。")
-                    all_color_settings_applied = False
+                    logging.warning(f"  警告: プロジェクト設定 '{setting_name}' を取得できませんでした。スキップします。")
+        for setting_name, value in color_settings.items():
+            logging.info(f"  カラー設定 '{setting_name}': {value}")
+        self._color_settings = color_settings
+        return color_settings
+
+    def target_settings(self, width: int, height: int) -> Dict[str, str]:
+        """タイムラインに適用する設定を適用順に作成（出力カラースペースを除く）"""
+        settings = {
+            "useCustomSettings": "1",
+            "timelineResolutionWidth": str(width),
+            "timelineResolutionHeight": str(height),
+            "timelineOutputResolutionWidth": str(width),
+            "timelineOutputResolutionHeight": str(height),
+            # カラー設定の適用前に自動カラーマネジメントを無効化
+            "isAutoColorManage": "0",
+        }
+        for setting_name, value in self._get_color_settings().items():
+            if setting_name != "colorSpaceOutput":
+                settings[setting_name] = value
+        return settings
+
+    def _output_color_space_candidates(self) -> list:
+        """出力カラースペースとして試す値を優先順に作成"""
+        if self.config.should_force_color_settings():
+            value = self._get_color_settings().get("colorSpaceOutput")
+            return [value] if value else []
+        # プロジェクト設定優先時はsRGBに設定（前回受け付けられた表記を最初に試す）
+        candidates = list(SRGB_VARIANTS)
+        if self._srgb_variant in candidates:
+            candidates.remove(self._srgb_variant)
+            candidates.insert(0, self._srgb_variant)
+        return candidates
+
+    def apply(self, timeline, width: int, height: int) -> bool:
+        """タイムラインの現在値と異なる設定だけを適用し、すべて適用できたかどうかを返す"""
+        timeline_name = timeline.GetName()
+        current = timeline.GetSetting()
+        if not isinstance(current, dict):
+            current = {}
+
+        all_settings_applied = True
+        changed = 0
+        for setting_name, value in self.target_settings(width, height).items():
+            if str(current.get(setting_name)) == value:
+                continue
+            if timeline.SetSetting(setting_name, value):
+                changed += 1
             else:
-                logging.warning(f"  警告: プロジェクト設定 '{setting_name}' を取得できませんでした。スキップします。")
+                logging.error(f"    -> エラー: タイムライン設定 '{setting_name}' の適用に失敗しました。")
+                all_settings_applied = False
 
-    # カラー設定適用後に自動カラーマネジメントを無効化
-    if timeline.SetSetting("isAutoColorManage", "0"):
-        logging.info("自動カラーマネジメントを無効化しました。")
-    else:
-        logging.warning("自動カラーマネジメントの無効化に失敗しました。")
-    
-    # フォールバック: sRGB強制設定
-    output_color_space = config.get_color_setting("colorSpaceOutput") if config.should_force_color_settings() else None
-    if output_color_space:
-        # 設定ファイルで指定された値を試行
-        if timeline.SetSetting("colorSpaceOutput", output_color_space):
-            logging.info(f"出力カラースペースを設定ファイル値'{output_color_space}'に設定しました。")
-        else:
-            logging.warning(f"設定ファイル値'{output_color_space}'の設定に失敗しました。")
-    else:
-        # デフォルトのsRGBバリエーションを試行
-        srgb_variants = ["sRGB", "sRGB (D65)", "sRGB D65"]
-        for variant in srgb_variants:
-            if timeline.SetSetting("colorSpaceOutput", variant):
-                logging.info(f"出力カラースペースを強制的に'{variant}'に設定しました。")
-                break
+        # 出力カラースペース（sRGBの表記は受け付けられるものを探して記憶）
+        candidates = self._output_color_space_candidates()
+        if candidates and str(current.get("colorSpaceOutput")) not in candidates[:1]:
+            for candidate in candidates:
+                if timeline.SetSetting("colorSpaceOutput", candidate):
+                    changed += 1
+                    if not self.config.should_force_color_settings() and candidate != self._srgb_variant:
+                        self._srgb_variant = candidate
+                        if self.store:
+                            self.store.put_setting(SRGB_VARIANT_SETTING, candidate)
+                    break
+            else:
+                logging.warning(f"出力カラースペースの設定に失敗しました。すべての候補で試行しましたが適用されませんでした: {candidates}")
+                all_settings_applied = False
+
+        if all_settings_applied:
+            logging.info(f"タイムライン '{timeline_name}' の設定を適用しました（変更 {changed}件）。")
         else:
-            logging.warning("sRGBの設定に失敗しました。すべての候補で試行しましたが適用されませんでした。")
+            logging.warning(f"タイムライン '{timeline_name}' の一部設定の適用に失敗しました。")
+        return all_settings_applied
+
+# 連番付きタイムライン名の末尾（" Part 2"等）
+TIMELINE_PART_PATTERN = re.compile(r" Part (\d+)$")
+
+def timeline_part_number(name: str) -> int:
+    """連番付きタイムライン名から連番を取得（連番がない場合は1）"""
+    match = TIMELINE_PART_PATTERN.search(name)
+    return int(match.group(1)) if match else 1
 
-    if all_color_settings_applied:
-        logging.info(f"タイムライン '{timeline.GetName()}' のカラー設定が正常に適用されました。")
+def remove_unrecorded_items(timeline, pending_keys, recorded_keys):
+    """中断した実行が追加し、配置を記録する前だったタイムラインアイテムを削除（ユーザーが追加したクリップは残す）"""
+    unrecorded_keys = set(pending_keys) - set(recorded_keys)
+    unrecorded = []
+    for timeline_item in timeline.GetItemListInTrack("video", 1) or []:
+        media_pool_item = timeline_item.GetMediaPoolItem()
+        if media_pool_item and take_clip_snapshot(media_pool_item).key in unrecorded_keys:
+            unrecorded.append(timeline_item)
+    if not unrecorded:
+        return
+    if timeline.DeleteClips(unrecorded):
+        logging.warning(f"中断時に処理途中だったクリップを削除しました: {timeline.GetName()} ({len(unrecorded)}件)")
     else:
-        logging.warning(f"タイムライン '{timeline.GetName()}' の一部カラー設定の適用に失敗またはスキップされました。")
+        logging.error(f"中断時に処理途中だったクリップの削除に失敗: {timeline.GetName()} ({len(unrecorded)}件)")
 
-def main():
-    try:
-        # スクリプトのパスを取得
-        script_path = os.path.dirname(os.path.abspath(
-            r"C:\Users\atak\AppData\Roaming\Blackmagic Design\DaVinci Resolve\Support\Fusion\Scripts\Edit\DRSorter\DRSorter.py"
-        ))
-        
-        # 設定を読み込む
-        config = Config(os.path.join(script_path, "config.yaml"))
+class TimelineAllocator:
+    """解像度ごとの追加先タイムラインを管理し、クリップ数の上限に達したら連番の新しいタイムラインを作成するクラス"""
+    def __init__(self, session: "SortSession", run_time: str, max_clips: int, label: Optional[str] = None):
+        self.session = session
+        self.run_time = run_time
+        self.base_run_time = run_time  # 名前が重なった場合に連番を付ける前の実行日時
+        self.run_number = 1            # 実行日時に付けた連番
+        self.max_clips = max_clips
+        self.label = label  # 複数のビンを処理する場合にタイムライン名へ付けるビンの名前
+        self.current = {}  # 解像度をキーとした[タイムライン, 名前, 連番, クリップ数]
+        self.timeline_names = set()  # この実行（中断した実行を含む）で作成したタイムライン名
+
+    def restore(self, resolution: str, timeline, name: str, count: int, created: bool = False):
+        """既存のタイムラインを追加先として登録（createdは中断した実行で作成したタイムラインの場合）"""
+        self.current[resolution] = [timeline, name, timeline_part_number(name), count]
+        if created:
+            self.timeline_names.add(name)
+
+    def _create(self, resolution: str, part: int):
+        """解像度のタイムラインを作成して設定を適用"""
+        width, height = map(int, resolution.split('x'))
+        name = f"#{width}x{height} Photos {self.run_time}"
+        if self.label:
+            name = f"{name} {self.label}"
+        if self.max_clips:
+            name = f"{name} Part {part}"
+        with profile_phase("assembly"):
+            timeline = self.session.media_pool.CreateEmptyTimeline(name)
+        if not timeline:
+            # 前回の中断時に作成だけされていた空のタイムラインは再利用
+            timeline = find_timelines_by_name(self.session.project).get(name)
+            if timeline and timeline.GetItemListInTrack("video", 1):
+                # 同じ秒に実行した振り分けのタイムラインと名前が重なった場合は実行日時に連番を付けて作成し直す
+                self.run_number += 1
+                self.run_time = f"{self.base_run_time} ({self.run_number})"
+                logging.info(f"同じ名前のタイムラインがあるため実行日時に連番を付けます: {self.run_time}")
+                return self._create(resolution, part)
+            if not timeline:
+                raise Exception(f"タイムライン作成に失敗: {width}x{height}")
+            logging.info(f"作成済みの空のタイムラインを再利用: {name}")
         
-        # Resolveに接続
-        resolve = get_resolve()
-        project = resolve.GetProjectManager().GetCurrentProject()
-        if not project:
-            raise Exception("プロジェクトを取得できません")
+        # タイムラインの解像度設定
+        with profile_phase("settings"):
+            self.session.timeline_settings.apply(timeline, width, height)
+        count_event("timelines")
+        state = [timeline, name, part, 0]
+        self.current[resolution] = state
+        self.timeline_names.add(name)
+        return state
 
-        media_pool = project.GetMediaPool()
-        if not media_pool:
-            raise Exception("メディアプールを取得できません")
+    def allocate(self, resolution: str, clip_list: list):
+        """クリップを追加先タイムラインに割り当て、(タイムライン, クリップのリスト)を順に返す
 
-        folder = media_pool.GetCurrentFolder()
-        if not folder:
-            raise Exception("現在のフォルダを取得できません")
+        連番のタイムラインは前の分の追加が終わってから必要になった時点で作成する
+        """
+        remaining = clip_list
+        while remaining:
+            state = self.current.get(resolution)
+            if state is None:
+                state = self._create(resolution, 1)
+            elif self.max_clips and state[3] >= self.max_clips:
+                state = self._create(resolution, state[2] + 1)
+            room = self.max_clips - state[3] if self.max_clips else len(remaining)
+            clips, remaining = remaining[:room], remaining[room:]
+            state[3] += len(clips)
+            yield state[0], clips
 
-        media_items = folder.GetClipList()
-        if not media_items:
-            logging.warning("メディアアイテムが見つかりません")
-            return
+def split_into_chunks(snapshots, chunk_size: int, match_directory: bool = False) -> list:
+    """スナップショットをペアのキー順に並べ、ペアを分けずにchunk_size件程度ずつに分割"""
+    if chunk_size <= 0:
+        return [snapshots]
+    by_key = {}
+    for snapshot in snapshots:
+        by_key.setdefault(pairing_key(snapshot, match_directory), []).append(snapshot)
+    chunks = []
+    current = []
+    for key in sorted(by_key):
+        current.extend(by_key[key])
+        if len(current) >= chunk_size:
+            chunks.append(current)
+            current = []
+    if current:
+        chunks.append(current)
+    return chunks
+
+class SortSession:
+    """1回の実行で共有するResolveへの接続・設定・キャッシュをまとめるクラス"""
+    def __init__(self, project, media_pool, config: Config, store: Optional[CacheStore] = None,
+                 header_reader: Optional[HeaderMetadataReader] = None):
+        self.project = project
+        self.media_pool = media_pool
+        self.config = config
+        self.store = store
+        self.header_reader = header_reader
+        self.timeline_settings = TimelineSettingsApplier(project, config, store)
+
+def process_folder(session: SortSession, folder, label: Optional[str] = None):
+    """フォルダ内のクリップを解像度ごとのタイムラインに振り分け、最後に処理したタイムラインを返す"""
+    return process_media_items(session, get_folder_key(session.project, folder), folder.GetClipList(), label)
+
+def process_merged_folders(session: SortSession, folders: list, folder_key: Optional[str] = None):
+    """複数のフォルダのクリップをまとめて解像度ごとのタイムラインに振り分け、最後に処理したタイムラインを返す"""
+    media_items = []
+    for _, folder in folders:
+        media_items.extend(folder.GetClipList() or [])
+    if folder_key is None:
+        folder_key = "+".join(get_folder_key(session.project, folder) for _, folder in folders)
+    # 別のビンの同じ名前のファイルをペアにしないようにフォルダごとにペアを判定
+    return process_media_items(session, folder_key, media_items, match_directory=True)
+
+# 解像度を取得できなかったファイルやペアの基準がないRAWを取り込むサブビンの名前
+INGEST_UNSORTED_BIN = "未分類"
+
+def _scan_directory(path: str) -> Tuple[list, list]:
+    """フォルダ直下の静止画ファイルとサブフォルダを列挙"""
+    files = []
+    subdirs = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in STILL_FORMAT_EXTENSIONS:
+                    files.append(entry.path)
+    except OSError as e:
+        logging.warning(f"フォルダの読み取りに失敗: {path}, エラー: {str(e)}")
+    return files, subdirs
+
+def scan_still_files(root: str, max_workers: int = 8) -> list:
+    """os.scandirでフォルダ以下の静止画ファイルをスレッドプールで並列に列挙"""
+    files = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = [executor.submit(_scan_directory, root)]
+        while pending:
+            found, subdirs = pending.pop().result()
+            files.extend(found)
+            pending.extend(executor.submit(_scan_directory, subdir) for subdir in subdirs)
+    return sorted(files)
+
+def plan_ingest(file_paths, config: Config, header_reader: HeaderMetadataReader) -> Tuple[Dict[str, list], int]:
+    """ファイルをペアにしてヘッダーから基準のファイルの解像度を読み取り、
+    サブビンの名前をキーとしたファイルパスのリストと、ペアの基準が見つからないRAWの件数を返す"""
+    snapshots = [ClipSnapshot(None, {"Clip Name": os.path.basename(path), "File Path": path}) for path in file_paths]
+    # 取り込み後の振り分けと同じくフォルダごとにペアを判定
+    index = PairingIndex(snapshots, True)
+    default_primary_formats, _ = config.get_pairing_formats(None)
+    primaries = {key: PairingIndex.select(formats, default_primary_formats) for key, formats in index.groups.items()}
+    headers = header_reader.read_all([primary.file_path for primary in primaries.values() if primary])
+
+    bins = {}
+    orphans = 0
+    for key, formats in index.groups.items():
+        bin_name = INGEST_UNSORTED_BIN
+        primary = primaries[key]
+        if primary:
+            header = headers.get(primary.file_path) or {}
+            # カメラごとの基準の形式が異なる場合は選び直し、解析できない形式は最初の基準のヘッダーを使用
+            primary, _ = index.pair(key, config, header.get("camera_type"))
+            header = headers.get(primary.file_path) or header
+            if header.get("width"):
+                primary.set_resolution(header["width"], header["height"])
+                bin_name = f"{primary.resolution} {primary.orientation}"
+        else:
+            orphans += sum(1 for snapshot in formats.values() if snapshot.is_raw)
+        # ペアにならない形式も含めて同じ写真のファイルは同じサブビンに取り込む
+        bins.setdefault(bin_name, []).extend(snapshot.file_path for snapshot in formats.values())
+    return bins, orphans
+
+def find_or_add_subfolder(media_pool, parent, name: str):
+    """サブフォルダを名前で検索し、存在しない場合は作成"""
+    folder = next((sub for sub in parent.GetSubFolderList() or [] if sub.GetName() == name), None)
+    return folder or media_pool.AddSubFolder(parent, name)
+
+def normalize_file_path(path: str) -> str:
+    """取り込み済みかどうかの比較に使用するファイルパスの正規化"""
+    return os.path.normcase(os.path.normpath(path))
+
+def ingest_source_folder(session: SortSession, source: str) -> Tuple[Any, list, list]:
+    """フォルダ以下の写真を解像度・向きごとのサブビンに取り込み、
+    (取り込み先のビン, (ラベル, サブビン)のリスト, サブビン内のクリップのスナップショット)を返す"""
+    config = session.config
+    media_pool = session.media_pool
+    if session.header_reader is None:
+        # 取り込み時に読み取ったヘッダーは振り分け時のメタデータ取得にも使用
+        session.header_reader = HeaderMetadataReader(config.get_ingest_workers())
+
+    with profile_phase("ingest"):
+        file_paths = scan_still_files(source, config.get_ingest_workers())
+        logging.info(f"取り込み対象のファイル: {len(file_paths)}件 ({source})")
+        bins, orphans = plan_ingest(file_paths, config, session.header_reader)
+        if orphans:
+            logging.warning(f"ペアの基準となるファイル（JPEG・HEIF）が見つからないRAWは{INGEST_UNSORTED_BIN}に取り込みます: {orphans}件")
+
+        root_name = config.get_ingest_bin()
+        ingest_root = find_or_add_subfolder(media_pool, media_pool.GetRootFolder(), root_name)
+        if not ingest_root:
+            raise Exception(f"取り込み先のビンを作成できません: {root_name}")
+
+        batch_size = config.get_import_batch_size()
+        folders = []
+        snapshots = []
+        # 取り込み先に切り替えた現在のフォルダは最後に元に戻す
+        current_folder = media_pool.GetCurrentFolder()
+        try:
+            for bin_name in sorted(bins):
+                folder = find_or_add_subfolder(media_pool, ingest_root, bin_name)
+                if not folder:
+                    logging.error(f"ビンの作成に失敗: {bin_name}")
+                    continue
+                # 前回までに取り込み済みのファイルは除外（スナップショットは振り分けでもそのまま使用）
+                existing = [take_clip_snapshot(item) for item in folder.GetClipList() or []]
+                snapshots.extend(existing)
+                imported = {normalize_file_path(snapshot.file_path) for snapshot in existing}
+                paths = [path for path in bins[bin_name] if normalize_file_path(path) not in imported]
+                if paths:
+                    media_pool.SetCurrentFolder(folder)
+                    count = 0
+                    for start in range(0, len(paths), batch_size):
+                        batch = paths[start:start + batch_size]
+                        items = media_pool.ImportMedia(batch) or []
+                        if len(items) < len(batch):
+                            logging.warning(f"一部のファイルを取り込めませんでした: {bin_name} ({len(items)}/{len(batch)}件)")
+                        snapshots.extend(take_clip_snapshot(item) for item in items)
+                        count += len(items)
+                    logging.info(f"ビン {bin_name} に取り込みました: {count}件")
+                folders.append((f"{root_name}/{bin_name}", folder))
+        finally:
+            if current_folder:
+                media_pool.SetCurrentFolder(current_folder)
+    return ingest_root, folders, snapshots
+
+def process_media_items(session: SortSession, folder_key: str, media_items: list, label: Optional[str] = None,
+                        match_directory: bool = False):
+    """メディアアイテムを解像度ごとのタイムラインに振り分け、最後に処理したタイムラインを返す"""
+    # プロパティを一括取得してスナップショット化
+    with profile_phase("cache build"):
+        snapshots = [take_clip_snapshot(item) for item in media_items or []]
+    return process_snapshots(session, folder_key, snapshots, label, match_directory)
+
+def process_snapshots(session: SortSession, folder_key: str, snapshots: list, label: Optional[str] = None,
+                      match_directory: bool = False):
+    """クリップのスナップショットを解像度ごとのタイムラインに振り分け、最後に処理したタイムラインを返す"""
+    project = session.project
+    media_pool = session.media_pool
+    config = session.config
+    store = session.store
+    match_directory = match_directory or config.should_pair_by_directory()
+    if not snapshots:
+        logging.warning("メディアアイテムが見つかりません")
+        return None
 
-        # メディアアイテムのキャッシュを初期化
-        media_cache = MediaItemCache(media_items)
+    chunk_size = config.get_chunk_size()
+    # 配置記録は増分モードと中断からの再開にのみ使用
+    track_placements = bool(store and (config.is_incremental() or chunk_size))
+    checkpoint = store.get_checkpoint(folder_key) if store and chunk_size else None
+    run_time = checkpoint[0] if checkpoint else datetime.now().strftime("%Y-%m-%d %H-%M-%S")
+    allocator = TimelineAllocator(session, run_time, config.get_max_clips_per_timeline(), label)
+
+    # 中断した実行の再開時・増分モードでは既存のタイムラインに配置済みのクリップを処理対象から除外
+    placed = {}
+    # 増分モードでは前回までに追加しないと報告したクリップも、ペアの相手が増えない限り処理対象から除外
+    skipped = set()
+    track_skipped = bool(store and config.is_incremental())
+    if checkpoint or (store and config.is_incremental()):
+        existing_timelines = find_timelines_by_name(project)
+        all_placements = store.get_placements(folder_key)
+        placements = {clip_key: placement for clip_key, placement in all_placements.items()
+                      if placement[0] in existing_timelines}
+        # 削除されたタイムラインへの配置記録は以後も使用しないため削除
+        removed_timelines = {timeline_name for timeline_name, _ in all_placements.values()} - set(existing_timelines)
+        if removed_timelines:
+            store.remove_placements(folder_key, removed_timelines)
+        placed_counts = {}
+        for timeline_name, _ in placements.values():
+            placed_counts[timeline_name] = placed_counts.get(timeline_name, 0) + 1
+        if config.is_incremental():
+            placed.update(placements)
+            skipped = store.get_skipped(folder_key)
+            for resolution, timeline_name in store.get_placement_timelines(folder_key).items():
+                if timeline_name in existing_timelines:
+                    allocator.restore(resolution, existing_timelines[timeline_name], timeline_name,
+                                      placed_counts.get(timeline_name, 0))
+            logging.info(f"増分モード: 配置済みのクリップ {len(placed)}件")
+        if checkpoint:
+            _, created_names, pending = checkpoint
+            # 追加の途中で中断したタイムラインからは、その追加で記録前だったクリップだけを削除
+            for timeline_name, pending_keys in pending.items():
+                if timeline_name in existing_timelines:
+                    recorded_keys = [clip_key for clip_key, placement in placements.items()
+                                     if placement[0] == timeline_name]
+                    remove_unrecorded_items(existing_timelines[timeline_name], pending_keys, recorded_keys)
+            resumed_names = set(created_names) & set(existing_timelines)
+            placed.update({clip_key: placement for clip_key, placement in placements.items()
+                           if placement[0] in resumed_names})
+            for timeline_name in sorted(resumed_names, key=timeline_part_number):
+                timeline = existing_timelines[timeline_name]
+                resolution = next(resolution for name, resolution in placements.values() if name == timeline_name) \
+                    if placed_counts.get(timeline_name) else None
+                if resolution:
+                    allocator.restore(resolution, timeline, timeline_name, placed_counts[timeline_name], True)
+            logging.info(f"中断した処理を再開します: {run_time} (処理済みのクリップ {len(placed)}件)")
+
+    if placed or skipped:
+        with profile_phase("cache build"):
+            snapshots = select_unplaced_snapshots(snapshots, placed, match_directory, skipped)
+    if not snapshots:
+        logging.info("新しいクリップはありません")
+        if store and chunk_size:
+            store.clear_checkpoint(folder_key)
+        return None
+
+    # チャンクごとにメタデータ取得・グループ化・タイムラインへの追加を行い、完了したらチェックポイントを保存
+    chunks = split_into_chunks(snapshots, chunk_size, match_directory)
+    last_timeline = None
+    for chunk_index, chunk in enumerate(chunks, 1):
+        with profile_phase("cache build"):
+            media_cache = MediaItemCache(chunk, config, store, session.header_reader, match_directory)
         
         # 解像度でグループ化
-        resolution_groups = {}
-        for media_item in media_items:
-            if media_item.GetClipProperty("Type") == config.get_still_type():
-                format_type = media_item.GetClipProperty("Format")
-                if format_type == "JPEG":
-                    resolution = media_item.GetClipProperty("Resolution")
-                    try:
-                        width, height = map(int, resolution.split('x'))
-                        if resolution not in resolution_groups:
-                            resolution_groups[resolution] = []
-                        resolution_groups[resolution].append(media_item)
-                        
-                        # キャッシュから対応するDNGファイルを取得
-                        dng_item, _ = media_cache.get_dng_and_metadata(media_item)
-                        if dng_item and dng_item not in resolution_groups[resolution]:
-                            resolution_groups[resolution].append(dng_item)
-                                    
-                    except ValueError as e:
-                        logging.error(f"解像度の解析に失敗: {resolution}, エラー: {str(e)}")
-
-        # 解像度ごとにタイムライン作成
-        current_time = datetime.now().strftime("%Y-%m-%d %H-%M-%S")
-        last_timeline = None
+        with profile_phase("grouping"):
+            resolution_groups = group_by_resolution(media_cache, config)
+
+        if track_skipped:
+            # タイムラインに追加しないクリップ（対になるJPEGがないRAW・静止画以外・別の形式を優先したファイルなど）は
+            # 警告を出した今回だけ処理し、次回以降は対象から除外（追加に失敗したクリップは次回も再試行）
+            candidate_keys = {snapshot.key for items in resolution_groups.values() for snapshot in items}
+            skipped_keys = [snapshot.key for snapshot in chunk
+                            if snapshot.key not in candidate_keys and snapshot.key not in placed]
+            if skipped_keys:
+                store.record_skipped(folder_key, skipped_keys)
+
+        # 解像度ごとにタイムラインへ追加
         for resolution, items in resolution_groups.items():
-            width, height = map(int, resolution.split('x'))
-            
-            # タイムライン作成
-            timeline = media_pool.CreateEmptyTimeline(
-                f"#{width}x{height} Photos {current_time}")
-            if not timeline:
-                raise Exception(f"タイムライン作成に失敗: {width}x{height}")
-            
-            # タイムラインの解像度設定
-            set_timeline_resolution(project, timeline, width, height, config) # config を引数に追加
-            
-            # クリップ名でソート
-            items.sort(key=lambda x: x.GetClipProperty("Clip Name"))
-            
-            # クリップを追加（重複を避けるため、すでに追加済みのクリップ名を記録）
-            project.SetCurrentTimeline(timeline)
-            added_clip_names = []
-            for item in items:
-                clip_name = item.GetClipProperty("Clip Name")
-                if clip_name not in added_clip_names:
-                    media_pool.AppendToTimeline(item)
-                    added_clip_names.append(clip_name)
-            
-            # タイムラインアイテムの設定
-            timeline_items = timeline.GetItemListInTrack("video", 1)
-            if timeline_items:
-                for item in timeline_items:
-                    media_pool_item = item.GetMediaPoolItem()
-                    if media_pool_item.GetClipProperty("Format") == "DNG":
-                        _, metadata = media_cache.get_dng_and_metadata(media_pool_item)
-                        clip_name = media_pool_item.GetClipProperty("Clip Name")
-                        logging.info(f"DNGファイル {clip_name} のメタデータ処理開始")
-                        
-                        power_grade_path = config.get_power_grade_path(metadata["camera_type"])
-                        if power_grade_path:
-                            if os.path.exists(power_grade_path):
-                                logging.info(f"PowerGrade適用開始: {clip_name} -> {power_grade_path}")
-                                if not apply_grade_from_drx_using_graph(item, power_grade_path, 0):
-                                    logging.error(f"PowerGrade適用失敗: {clip_name}")
-                            else:
-                                logging.error(f"PowerGradeファイルが存在しません: {power_grade_path}")
-                        
-                        distortion = config.get_distortion(metadata["lens_type"])
-                        
-                        # 対応するJPEGファイルから縦横比を計算してスケールを設定
-                        base_name = os.path.splitext(media_pool_item.GetClipProperty("Clip Name"))[0]
-                        jpeg_item = media_cache.jpeg_cache.get(base_name)
-                        
-                        if jpeg_item:
-                            # JPEGの解像度を取得
-                            jpeg_res = jpeg_item.GetClipProperty("Resolution")
-                            jpeg_width, jpeg_height = map(int, jpeg_res.split('x'))
-                            
-                            # DNGの解像度を取得
-                            dng_res = media_pool_item.GetClipProperty("Resolution")
-                            dng_width, dng_height = map(int, dng_res.split('x'))
-                            
-                            if jpeg_width > jpeg_height:  # 横写真の場合
-                                # 縦写真と同じ統一計算式を使用
-                                scale = dng_width / jpeg_width
-                            elif jpeg_width < jpeg_height:  # 縦写真の場合
-                                # DNGの幅をJPEGの幅で割る統一計算式
-                                scale = dng_width / jpeg_width
-                                item.SetProperty("RotationAngle", config.get_rotation_angle())
-                            else:  # 正方形（1:1アスペクト比）の場合
-                                # 回転処理なし、スケール調整のみ
-                                # 正方形の場合はDNGをJPEGの解像度に合わせる
-                                scale = dng_width / jpeg_width
-                            
-                            item.SetProperty("ZoomX", scale)
-                            item.SetProperty("ZoomY", scale)  # Y軸にも同じスケールを適用
-                        else:
-                            logging.warning(f"対応するJPEGファイルが見つかりません: {base_name}")
-                        
-                        if power_grade_path:
-                            apply_grade_from_drx_using_graph(item, power_grade_path, 0)
-                        if distortion is not None:
-                            item.SetProperty("Distortion", distortion)
-            
-            last_timeline = timeline
+            # ペアのキー・クリップ名でソートして重複を除き、配置済みのクリップを除外
+            clip_list = [snapshot for snapshot in build_timeline_clip_list(items, media_cache.index.key)
+                         if snapshot.key not in placed]
+            for timeline, timeline_clips in allocator.allocate(resolution, clip_list):
+                if store and chunk_size:
+                    # 追加の途中で中断しても追加先のタイムラインと追加中のクリップを再開時に特定できるように保存
+                    store.save_checkpoint(folder_key, allocator.run_time, allocator.timeline_names,
+                                          {timeline.GetName(): [snapshot.key for snapshot in timeline_clips]})
+                # まとめて追加
+                with profile_phase("assembly"):
+                    project.SetCurrentTimeline(timeline)
+                    timeline_items = append_clips_to_timeline(media_pool, timeline_clips, config.get_append_chunk_size())
+                
+                # タイムラインアイテムの設定
+                if timeline_items:
+                    process_timeline_items(timeline, timeline_items, media_cache, config)
+                    if track_placements:
+                        store.record_placements(folder_key, timeline.GetName(), resolution,
+                                                [snapshot.key for _, snapshot in timeline_items])
+                
+                last_timeline = timeline
+
+        if store and chunk_size:
+            store.save_checkpoint(folder_key, allocator.run_time, allocator.timeline_names)
+        if len(chunks) > 1:
+            logging.info(f"チャンク {chunk_index}/{len(chunks)} の処理が完了しました ({len(chunk)}件)")
+
+    if store:
+        logging.info(f"メタデータキャッシュ: ヒット {store.hits}件, ミス {store.misses}件")
+        if chunk_size:
+            store.clear_checkpoint(folder_key)
+    return last_timeline
+
+def get_default_config_path() -> str:
+    """スクリプトと同じフォルダの設定ファイルのパスを取得"""
+    # スクリプトのパスを取得
+    script_path = os.path.dirname(os.path.abspath(
+        r"C:\Users\atak\AppData\Roaming\Blackmagic Design\DaVinci Resolve\Support\Fusion\Scripts\Edit\DRSorter\DRSorter.py"
+    ))
+    return os.path.join(script_path, "config.yaml")
+
+def run_sort(resolve, config: Config, store: Optional[CacheStore] = None,
+             header_reader: Optional[HeaderMetadataReader] = None):
+    """現在のプロジェクトで設定に応じたビンの写真をタイムラインに振り分ける"""
+    project = resolve.GetProjectManager().GetCurrentProject()
+    if not project:
+        raise Exception("プロジェクトを取得できません")
+
+    media_pool = project.GetMediaPool()
+    if not media_pool:
+        raise Exception("メディアプールを取得できません")
+
+    # 処理件数は実行の終了時にまとめて出力
+    with run_summary(store):
+        # 接続・設定・キャッシュは全ビンで共有
+        session = SortSession(project, media_pool, config, store, header_reader)
+        if config.is_incremental() and not store:
+            logging.warning("増分モードの配置の記録にはメタデータキャッシュが必要なため、ビン全体を処理します"
+                            "（cache.enabledを確認してください）")
+
+        ingest_root = None
+        if config.get_ingest_source():
+            # 取り込んだサブビンは解像度ごとにまとめて処理
+            ingest_root, folders, ingest_snapshots = ingest_source_folder(session, config.get_ingest_source())
+            if not folders:
+                raise Exception("取り込むファイルが見つかりません")
+        elif config.is_batch_mode():
+            folders = collect_batch_folders(media_pool, config)
+            if not folders:
+                raise Exception("処理対象のビンが見つかりません")
+        else:
+            folder = media_pool.GetCurrentFolder()
+            if not folder:
+                raise Exception("現在のフォルダを取得できません")
+            folders = [(None, folder)]
+
+        if ingest_root:
+            # 取り込み時のスナップショットを再利用し、取り込みの計画と同じくフォルダごとにペアを判定
+            last_timeline = process_snapshots(session, get_folder_key(project, ingest_root), ingest_snapshots,
+                                              match_directory=True)
+        elif len(folders) > 1 and config.should_merge_batch():
+            logging.info(f"{len(folders)}個のビンをまとめて処理します")
+            last_timeline = process_merged_folders(session, folders)
+        else:
+            last_timeline = None
+            for index, (label, folder) in enumerate(folders, 1):
+                if label is not None:
+                    logging.info(f"ビン {index}/{len(folders)}: {label}")
+                # 複数のビンを処理する場合はタイムライン名が重複しないようにビンの名前を付ける
+                timeline = process_folder(session, folder, label if len(folders) > 1 else None)
+                last_timeline = timeline or last_timeline
+
+        if store:
+            removed = store.prune(config.get_cache_max_age_days(), config.should_prune_missing_files())
+            if removed:
+                logging.info(f"古いメタデータキャッシュを削除しました: {removed}件")
 
         # 最後に作成されたタイムラインをアクティブに
         if last_timeline:
             project.SetCurrentTimeline(last_timeline)
         logging.info("処理が正常に完了しました")
 
+def main(config_path: Optional[str] = None):
+    config = None
+    store = None
+    try:
+        if config_path is None:
+            config_path = get_default_config_path()
+        
+        # 設定を読み込む
+        config = Config(config_path)
+        setup_logging(config)
+        
+        # Resolveに接続（計測が有効な場合はAPIオブジェクトをプロキシで包む）
+        profiler = start_profiling(config)
+        resolve = get_resolve()
+        if profiler:
+            resolve = profiler.wrap(resolve, "Resolve")
+        store = open_cache_store(config)
+        run_sort(resolve, config, store, create_header_reader(config))
+
     except Exception as e:
         logging.critical(f"予期せぬエラーが発生しました: {str(e)}")
         raise
+    finally:
+        if store:
+            store.close()
+        if _profiler:
+            _profiler.log_report(config.get_profiling_json_path())
+        shutdown_logging()
+
+# 接続したクライアントから要求の行を受信するまで待つ時間（秒）
+DAEMON_REQUEST_TIMEOUT = 10
+
+class DaemonLogHandler(logging.Handler):
+    """ログをJSON行としてクライアントへ送信するハンドラ（クライアントが切断しても処理は継続）"""
+    def __init__(self, stream):
+        super().__init__()
+        self.stream = stream
+        self.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    def send(self, message: Dict[str, Any]):
+        """1行のJSONとして送信"""
+        if self.stream is None:
+            return
+        try:
+            self.stream.write(json.dumps(message, ensure_ascii=False) + "\n")
+            self.stream.flush()
+        except (OSError, ValueError):
+            self.stream = None
+
+    def emit(self, record: logging.LogRecord):
+        self.send({"type": "log", "level": record.levelname, "message": self.format(record)})
+
+class SortDaemon:
+    """Resolveへの接続・設定・メタデータキャッシュを保持し、ローカルのソケットからの要求で振り分けを実行する常駐プロセス
+
+    要求と応答は1行ずつのJSONです。要求は{"command": "sort" | "ping" | "stop"}で、
+    処理中のログを{"type": "log", ...}、最後に結果を{"type": "result", "status": "ok" | "error", ...}として返します。
+    """
+    def __init__(self, config_path: str):
+        self.config_path = config_path
+        self.config = None
+        self.config_mtime = None
+        self.store = None
+        self.resolve = None
+        self.running = True
+
+    def _reload_config(self) -> bool:
+        """設定ファイルの更新日時が変わった場合のみ設定を読み込み直し、読み込み直したかどうかを返す"""
+        try:
+            mtime = os.path.getmtime(self.config_path)
+        except OSError:
+            mtime = None
+        if self.config is not None and mtime == self.config_mtime:
+            return False
+        if self.config is not None:
+            logging.info(f"設定ファイルの変更を検出したため再読み込みします: {self.config_path}")
+        self.config = Config(self.config_path)
+        self.config_mtime = mtime
+        setup_logging(self.config)
+        # キャッシュの設定が変わっている場合があるため開き直す
+        if self.store:
+            self.store.close()
+        self.store = open_cache_store(self.config)
+        return True
+
+    def _connect(self):
+        """Resolveへの接続を再利用し、切断されている場合は再接続"""
+        if self.resolve is not None:
+            try:
+                if self.resolve.GetProjectManager():
+                    return self.resolve
+            except Exception:
+                pass
+            logging.warning("Resolveとの接続が切れたため再接続します")
+        self.resolve = get_resolve()
+        return self.resolve
+
+    def sort(self):
+        """保持している接続・設定・キャッシュで振り分けを実行"""
+        if not self._reload_config():
+            # 設定ファイルが変わらなくても起動後にDRXファイルが作成・削除される場合があるため確認し直す
+            self.config.check_power_grades()
+        profiler = start_profiling(self.config)
+        resolve = self._connect()
+        if profiler:
+            resolve = profiler.wrap(resolve, "Resolve")
+        if self.store:
+            self.store.hits = self.store.misses = 0
+        try:
+            # ヘッダーの解析結果はファイルの更新を検出できないため実行ごとに作り直す
+            run_sort(resolve, self.config, self.store, create_header_reader(self.config))
+        finally:
+            if self.store:
+                self.store.flush()
+            if _profiler:
+                _profiler.log_report(self.config.get_profiling_json_path())
+
+    def handle(self, connection):
+        """1つの接続の要求を処理し、ログと結果を返す"""
+        # 接続したまま要求を送らないクライアントで待ち続けないよう、要求の受信にだけタイムアウトを設定
+        connection.settimeout(DAEMON_REQUEST_TIMEOUT)
+        stream = connection.makefile("rw", encoding="utf-8", newline="\n")
+        handler = DaemonLogHandler(stream)
+        try:
+            line = stream.readline()
+        except socket.timeout:
+            logging.warning(f"クライアントからの要求が{DAEMON_REQUEST_TIMEOUT}秒以内に届かないため切断します")
+            handler.send({"type": "result", "status": "error", "message": "要求の受信がタイムアウトしました"})
+            return
+        except OSError as e:
+            logging.warning(f"クライアントからの要求を受信できません: {str(e)}")
+            return
+        # 振り分けには時間がかかる場合があるため応答の送信はタイムアウトなしで行う
+        connection.settimeout(None)
+        try:
+            request = json.loads(line or "{}")
+        except ValueError:
+            request = {}
+        command = request.get("command") if isinstance(request, dict) else None
+
+        logging.getLogger().addHandler(handler)
+        try:
+            if command == "sort":
+                self.sort()
+                result = {"status": "ok"}
+            elif command == "ping":
+                result = {"status": "ok"}
+            elif command == "stop":
+                self.running = False
+                logging.info("デーモンを停止します")
+                result = {"status": "ok"}
+            else:
+                result = {"status": "error", "message": f"不明なコマンド: {command}"}
+        except Exception as e:
+            logging.critical(f"予期せぬエラーが発生しました: {str(e)}")
+            result = {"status": "error", "message": str(e)}
+        finally:
+            logging.getLogger().removeHandler(handler)
+        result["type"] = "result"
+        handler.send(result)
+
+    def serve(self):
+        """ローカルのソケットで要求を待ち受け、1件ずつ処理"""
+        self._reload_config()
+        self._connect()
+        host, port = self.config.get_daemon_address()
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server:
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            server.bind((host, port))
+            server.listen(1)
+            logging.info(f"デーモンを起動しました: {host}:{port}")
+            try:
+                while self.running:
+                    connection, _ = server.accept()
+                    with connection:
+                        self.handle(connection)
+            finally:
+                if self.store:
+                    self.store.close()
+                    self.store = None
+                shutdown_logging()
+
+def serve(config_path: Optional[str] = None):
+    """デーモンとして起動"""
+    SortDaemon(config_path or get_default_config_path()).serve()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="DaVinci Resolveの写真をタイムラインに振り分けます")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Resolveへの接続と設定を保持して常駐し、DRSorterClient.pyからの要求で振り分けを実行")
+    parser.add_argument("--config", help="設定ファイルのパス（省略時はスクリプトのフォルダのconfig.yaml）")
+    args, _ = parser.parse_known_args()
+    if args.daemon:
+        serve(args.config)
+    else:
+        main(args.config)
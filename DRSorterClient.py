@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""常駐中のDRSorterデーモンに振り分けを依頼し、処理中のログを表示するクライアント
+
+DRSorter.pyの代わりにResolveのスクリプトフォルダに配置してメニューから実行します。
+標準ライブラリのみを使用し、接続・設定の読み込みはデーモン側で済ませておくため、すぐに振り分けが始まります。
+デーモンは事前に `python DRSorter.py --daemon` で起動しておいてください。
+"""
+
+import json
+import socket
+import sys
+
+# デーモンの待ち受けアドレス（config.yamlのdaemon.host・daemon.portと合わせてください）
+HOST = "127.0.0.1"
+PORT = 50517
+
+# デーモンへの接続を待つ時間（秒）
+CONNECT_TIMEOUT = 5
+
+def request(command: str = "sort") -> int:
+    """デーモンにコマンドを送信してログを表示し、終了コードを返す"""
+    try:
+        connection = socket.create_connection((HOST, PORT), timeout=CONNECT_TIMEOUT)
+    except OSError as e:
+        print(f"DRSorterデーモンに接続できません: {HOST}:{PORT} ({str(e)})")
+        print("`python DRSorter.py --daemon` でデーモンを起動してください")
+        return 1
+
+    with connection:
+        # 振り分けには時間がかかる場合があるため接続後はタイムアウトなしで待つ
+        connection.settimeout(None)
+        stream = connection.makefile("rw", encoding="utf-8", newline="\n")
+        stream.write(json.dumps({"command": command}) + "\n")
+        stream.flush()
+        for line in stream:
+            message = json.loads(line)
+            if message.get("type") == "log":
+                print(message.get("message", ""))
+            elif message.get("type") == "result":
+                if message.get("status") != "ok":
+                    print(f"エラー: {message.get('message', '')}")
+                    return 1
+                return 0
+
+    print("デーモンとの接続が切断されました")
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(request(sys.argv[1] if len(sys.argv) > 1 else "sort"))
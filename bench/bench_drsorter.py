@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""DRSorterのスケーリングベンチマーク
+
+fake_resolveで合成したビン（JPEG+DNGのスチル、縦横・カメラ混在）に対してDRSorterを実行し、
+クリップ数ごとの全体時間とフェーズごとの時間・API呼び出し回数を出力します。
+DaVinci Resolveは不要で、Linux上でもそのまま実行できます。
+
+    python bench/bench_drsorter.py --sizes 1000 10000 50000 --latency 0.0002
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+
+import yaml
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import fake_resolve
+fake_resolve.install()
+
+import DRSorter
+
+# レポートに出力するフェーズ（計測されなかったフェーズは0として表示）
+PHASES = ("cache build", "grouping", "assembly", "settings", "grading", "scaling")
+
+def write_config(work_dir: str, cache: bool, log_level: str = "WARNING") -> str:
+    """ベンチマーク用の設定ファイルとDRXファイルを作成"""
+    cameras = {}
+    for camera, _, _, _ in fake_resolve.SYNTHETIC_CAMERAS:
+        drx_path = os.path.join(work_dir, f"{camera}.drx")
+        open(drx_path, 'w').close()
+        cameras[camera] = {"power_grade": drx_path}
+    default_drx = os.path.join(work_dir, "default.drx")
+    open(default_drx, 'w').close()
+    lenses = {lens: {"distortion": 0.1}
+              for _, camera_lenses, _, _ in fake_resolve.SYNTHETIC_CAMERAS for lens in camera_lenses}
+
+    config = {
+        "common": {"still_type": "スチル"},
+        "default": {"power_grade": default_drx, "distortion": 0},
+        "cameras": cameras,
+        "lenses": lenses,
+        "cache": {"enabled": cache},
+        "profiling": {"enabled": True, "json_path": "profile.json"},
+        "logging": {"level": log_level},
+    }
+    config_path = os.path.join(work_dir, "config.yaml")
+    with open(config_path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(config, f, allow_unicode=True)
+    return config_path
+
+def run_once(config_path: str, size: int, seed: int, create_files: bool) -> dict:
+    """合成したビンに対してDRSorterを1回実行し、計測結果を返す"""
+    resolve = fake_resolve.reset()
+    project = resolve.project
+    work_dir = os.path.dirname(config_path)
+    items = fake_resolve.generate_stills(project.media_pool.current_folder, size, seed,
+                                         root_dir=os.path.join(work_dir, "card"))
+    if create_files:
+        # 永続キャッシュはファイルのサイズと更新日時をキーにするため空ファイルを作成
+        for item in items:
+            file_path = item.properties["File Path"]
+            if not os.path.exists(file_path):
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                open(file_path, 'w').close()
+    DRSorter.main(config_path)
+
+    with open(os.path.join(work_dir, "profile.json"), encoding='utf-8') as f:
+        report = json.load(f)
+    report["size"] = size
+    report["timelines"] = len(project.timelines)
+    report["timeline_items"] = sum(len(timeline.items) for timeline in project.timelines)
+    return report
+
+def format_row(report: dict) -> str:
+    """計測結果を1行の表形式に整形"""
+    cells = [f"{report['size']:>7}", f"{report['wall_time']:>8.3f}s", f"{report['total_calls']:>8}"]
+    for phase in PHASES:
+        cells.append(f"{report['phases'].get(phase, 0.0):>8.3f}s/{report['phase_calls'].get(phase, 0):<7}")
+    return " ".join(cells)
+
+def main():
+    parser = argparse.ArgumentParser(description="DRSorterのスケーリングベンチマーク")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000],
+                        help="ビンのクリップ数（複数指定可、例: 1000 10000 50000）")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="APIメソッド1回あたりの待機時間（秒）")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="同じ設定で繰り返す回数（--cacheと組み合わせると2回目以降はキャッシュ済み）")
+    parser.add_argument("--cache", action="store_true",
+                        help="永続メタデータキャッシュを有効化（合成クリップの空ファイルを作業フォルダに作成）")
+    parser.add_argument("--seed", type=int, default=0, help="合成データの乱数シード")
+    parser.add_argument("--json", help="全計測結果を書き出すJSONファイル")
+    parser.add_argument("--verbose", action="store_true", help="DRSorterのINFOログを表示")
+    args = parser.parse_args()
+
+    log_level = "INFO" if args.verbose else "WARNING"
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+    fake_resolve.set_latency(args.latency)
+
+    header = ["   size", "    wall", "   calls"] + [f"{phase:>17}" for phase in PHASES]
+    print(" ".join(header))
+    reports = []
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as work_dir:
+            config_path = write_config(work_dir, args.cache, log_level)
+            for _ in range(args.repeat):
+                report = run_once(config_path, size, args.seed, args.cache)
+                reports.append(report)
+                print(format_row(report))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
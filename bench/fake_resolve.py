@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""DaVinci Resolveスクリプティング APIのうちDRSorterが使用する部分のローカル実装
+
+DaVinci Resolveを起動せずにDRSorterを実行・計測するためのモジュールです。
+install()でDaVinciResolveScriptとして登録してからDRSorterをインポートしてください。
+APIメソッドの呼び出しごとに set_latency() で指定した時間だけ待機し、IPCのコストを再現します。
+"""
+
+import os
+import random
+import sys
+import time
+from typing import Optional, Dict, Any, List
+
+# 出力カラースペースとして受け付ける値（Resolveのバージョンにより表記が異なるため限定する）
+ACCEPTED_COLOR_SPACE_OUTPUTS = {"sRGB", "Rec.709", "Rec.709 Gamma 2.4", "Rec.2020"}
+
+# 合成データで使用するカメラ（モデル名, レンズの候補, JPEGの長辺, 短辺）
+SYNTHETIC_CAMERAS = [
+    ("DC-GH7", ["OLYMPUS M.17mm F1.8", "LUMIX G VARIO 12-60/F3.5-5.6"], 5776, 4336),
+    ("ILCE-7M4", ["FE 24-70mm F2.8 GM II", "FE 35mm F1.8"], 7008, 4672),
+    ("X-T5", ["XF23mmF1.4 R LM WR", "XF56mmF1.2 R WR"], 7728, 5152),
+]
+
+# ImportMediaで取り込んだファイルの拡張子ごとのFormatプロパティ
+IMPORT_FORMATS = {
+    ".jpg": "JPEG", ".jpeg": "JPEG", ".heif": "HEIF", ".heic": "HEIF", ".hif": "HEIF",
+    ".dng": "DNG", ".arw": "ARW", ".cr3": "CR3", ".nef": "NEF", ".raf": "RAF", ".orf": "ORF", ".rw2": "RW2",
+}
+
+# ImportMediaで取り込んだファイルのType（クリップの種類）
+IMPORT_CLIP_TYPE = "スチル"
+
+class ApiStats:
+    """APIメソッドの呼び出し回数と待機時間を管理するクラス"""
+    def __init__(self):
+        self.latency = 0.0
+        self.calls = {}  # "クラス.メソッド"をキーとした呼び出し回数
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def reset(self):
+        """呼び出し回数をリセット"""
+        self.calls = {}
+
+_stats = ApiStats()
+_media_files = {}  # ファイルパスをキーとした(解像度, メタデータ)
+
+def register_media_file(path: str, resolution: str, metadata: Optional[Dict[str, str]] = None):
+    """ImportMediaで取り込むファイルの解像度とメタデータを登録"""
+    _media_files[path] = (resolution, dict(metadata or {}))
+
+def set_latency(seconds: float):
+    """APIメソッド1回あたりの待機時間を設定"""
+    _stats.latency = seconds
+
+def get_stats() -> ApiStats:
+    """API呼び出しの統計を取得"""
+    return _stats
+
+def api_method(func):
+    """APIメソッドの呼び出しを記録し、設定された待機時間だけ待つデコレータ"""
+    name = func.__qualname__
+
+    def call(*args, **kwargs):
+        _stats.calls[name] = _stats.calls.get(name, 0) + 1
+        if _stats.latency:
+            time.sleep(_stats.latency)
+        return func(*args, **kwargs)
+    call.__name__ = func.__name__
+    call.__qualname__ = name
+    return call
+
+class FakeMediaPoolItem:
+    """メディアプールアイテム"""
+    def __init__(self, properties: Dict[str, Any], metadata: Optional[Dict[str, str]] = None):
+        self.properties = dict(properties)
+        self.metadata = dict(metadata or {})
+        self.unique_id = f"mpi-{id(self):x}"
+
+    @api_method
+    def GetName(self):
+        return self.properties.get("Clip Name", "")
+
+    @api_method
+    def GetUniqueId(self):
+        return self.unique_id
+
+    @api_method
+    def GetClipProperty(self, name=None):
+        if name is None:
+            return dict(self.properties)
+        return self.properties.get(name, "")
+
+    @api_method
+    def GetMetadata(self, name=None):
+        if name is None:
+            return dict(self.metadata)
+        return self.metadata.get(name, "")
+
+class FakeNodeGraph:
+    """タイムラインアイテムのノードグラフ"""
+    def __init__(self, timeline_item: "FakeTimelineItem"):
+        self.timeline_item = timeline_item
+
+    @api_method
+    def ApplyGradeFromDRX(self, path, grade_mode):
+        if not os.path.exists(path):
+            return False
+        self.timeline_item.grades.append(path)
+        return True
+
+class FakeTimelineItem:
+    """タイムラインアイテム"""
+    def __init__(self, media_pool_item: FakeMediaPoolItem):
+        self.media_pool_item = media_pool_item
+        self.properties = {}
+        self.grades = []  # 適用されたDRXのパス（適用順）
+
+    @api_method
+    def GetName(self):
+        return self.media_pool_item.properties.get("Clip Name", "")
+
+    @api_method
+    def GetMediaPoolItem(self):
+        return self.media_pool_item
+
+    @api_method
+    def GetProperty(self, name=None):
+        if name is None:
+            return dict(self.properties)
+        return self.properties.get(name)
+
+    @api_method
+    def SetProperty(self, name, value):
+        self.properties[name] = value
+        return True
+
+    @api_method
+    def GetNodeGraph(self):
+        return FakeNodeGraph(self)
+
+class FakeTimeline:
+    """タイムライン"""
+    def __init__(self, name: str, project_settings: Dict[str, str]):
+        self.name = name
+        self.unique_id = f"timeline-{id(self):x}"
+        self.settings = dict(project_settings)
+        self.settings["isAutoColorManage"] = "1"
+        self.items = []
+
+    @api_method
+    def GetName(self):
+        return self.name
+
+    @api_method
+    def GetUniqueId(self):
+        return self.unique_id
+
+    @api_method
+    def GetSetting(self, name=None):
+        if name is None:
+            return dict(self.settings)
+        return self.settings.get(name, "")
+
+    @api_method
+    def SetSetting(self, name, value):
+        if name == "colorSpaceOutput" and value not in ACCEPTED_COLOR_SPACE_OUTPUTS:
+            return False
+        self.settings[name] = value
+        return True
+
+    @api_method
+    def GetItemListInTrack(self, track_type, index):
+        if track_type != "video" or index != 1:
+            return []
+        return list(self.items)
+
+    @api_method
+    def DeleteClips(self, items, ripple=False):
+        targets = set(map(id, items))
+        self.items = [item for item in self.items if id(item) not in targets]
+        return True
+
+    @api_method
+    def ApplyGradeFromDRX(self, path, grade_mode, items):
+        if not os.path.exists(path):
+            return False
+        for item in items:
+            item.grades.append(path)
+        return True
+
+class FakeFolder:
+    """メディアプールのフォルダ（ビン）"""
+    def __init__(self, name: str):
+        self.name = name
+        self.unique_id = f"folder-{id(self):x}"
+        self.clips = []
+        self.subfolders = []
+
+    @api_method
+    def GetName(self):
+        return self.name
+
+    @api_method
+    def GetUniqueId(self):
+        return self.unique_id
+
+    @api_method
+    def GetClipList(self):
+        return list(self.clips)
+
+    @api_method
+    def GetSubFolderList(self):
+        return list(self.subfolders)
+
+class FakeMediaPool:
+    """メディアプール"""
+    def __init__(self, project: "FakeProject"):
+        self.project = project
+        self.root_folder = FakeFolder("Master")
+        self.current_folder = self.root_folder
+
+    @api_method
+    def GetRootFolder(self):
+        return self.root_folder
+
+    @api_method
+    def GetCurrentFolder(self):
+        return self.current_folder
+
+    @api_method
+    def SetCurrentFolder(self, folder):
+        self.current_folder = folder
+        return True
+
+    @api_method
+    def AddSubFolder(self, parent, name):
+        folder = FakeFolder(name)
+        parent.subfolders.append(folder)
+        return folder
+
+    @api_method
+    def ImportMedia(self, paths):
+        items = []
+        for path in paths:
+            if not os.path.isfile(path):
+                continue
+            name = os.path.basename(path)
+            resolution, metadata = _media_files.get(path, ("", {}))
+            items.append(FakeMediaPoolItem({
+                "Clip Name": name,
+                "File Path": path,
+                "Format": IMPORT_FORMATS.get(os.path.splitext(name)[1].lower(), ""),
+                "Type": IMPORT_CLIP_TYPE,
+                "Resolution": resolution,
+            }, metadata))
+        self.current_folder.clips.extend(items)
+        return items
+
+    @api_method
+    def CreateEmptyTimeline(self, name):
+        if any(timeline.name == name for timeline in self.project.timelines):
+            return None
+        timeline = FakeTimeline(name, self.project.settings)
+        self.project.timelines.append(timeline)
+        self.project.current_timeline = timeline
+        return timeline
+
+    @api_method
+    def AppendToTimeline(self, clips):
+        timeline = self.project.current_timeline
+        if timeline is None:
+            return []
+        if not isinstance(clips, (list, tuple)):
+            clips = [clips]
+        appended = []
+        for clip in clips:
+            # clipInfo形式（{"mediaPoolItem": ...}）にも対応
+            media_pool_item = clip.get("mediaPoolItem") if isinstance(clip, dict) else clip
+            if isinstance(media_pool_item, FakeMediaPoolItem):
+                appended.append(FakeTimelineItem(media_pool_item))
+        timeline.items.extend(appended)
+        return appended
+
+class FakeProject:
+    """プロジェクト"""
+    def __init__(self, name: str = "Benchmark"):
+        self.name = name
+        self.settings = {
+            "colorScienceMode": "davinciYRGBColorManagedv2",
+            "rcmPresetMode": "SDR",
+            "colorSpaceOutput": "Rec.709 Gamma 2.4",
+        }
+        self.timelines = []
+        self.current_timeline = None
+        self.media_pool = FakeMediaPool(self)
+
+    @api_method
+    def GetName(self):
+        return self.name
+
+    @api_method
+    def GetMediaPool(self):
+        return self.media_pool
+
+    @api_method
+    def GetSetting(self, name=None):
+        if name is None:
+            return dict(self.settings)
+        return self.settings.get(name, "")
+
+    @api_method
+    def SetSetting(self, name, value):
+        self.settings[name] = value
+        return True
+
+    @api_method
+    def GetTimelineCount(self):
+        return len(self.timelines)
+
+    @api_method
+    def GetTimelineByIndex(self, index):
+        if 1 <= index <= len(self.timelines):
+            return self.timelines[index - 1]
+        return None
+
+    @api_method
+    def GetCurrentTimeline(self):
+        return self.current_timeline
+
+    @api_method
+    def SetCurrentTimeline(self, timeline):
+        self.current_timeline = timeline
+        return True
+
+class FakeProjectManager:
+    """プロジェクトマネージャー"""
+    def __init__(self, project: FakeProject):
+        self.project = project
+
+    @api_method
+    def GetCurrentProject(self):
+        return self.project
+
+class FakeResolve:
+    """DaVinci Resolve本体"""
+    def __init__(self, project: Optional[FakeProject] = None):
+        self.project_manager = FakeProjectManager(project or FakeProject())
+
+    @property
+    def project(self) -> FakeProject:
+        return self.project_manager.project
+
+    @api_method
+    def GetProjectManager(self):
+        return self.project_manager
+
+_resolve = None
+
+def reset(resolve: Optional[FakeResolve] = None) -> FakeResolve:
+    """接続先のResolveを新しく作り直し、呼び出し回数をリセット"""
+    global _resolve
+    _resolve = resolve or FakeResolve()
+    _stats.reset()
+    _media_files.clear()
+    return _resolve
+
+def scriptapp(name: str):
+    """DaVinciResolveScript.scriptapp 互換の接続関数"""
+    if name != "Resolve":
+        return None
+    if _resolve is None:
+        reset()
+    return _resolve
+
+def install():
+    """このモジュールをDaVinciResolveScriptとして登録"""
+    sys.modules["DaVinciResolveScript"] = sys.modules[__name__]
+
+def generate_stills(folder: FakeFolder, count: int, seed: int = 0, still_type: str = "スチル",
+                    root_dir: str = "/card") -> List[FakeMediaPoolItem]:
+    """JPEGとDNGが混在する合成のスチルをフォルダに追加
+
+    約80%がJPEG+DNGのペア、約10%ずつがJPEGのみ・DNGのみになります。
+    縦写真は約30%、正方形は約5%です。
+    """
+    rng = random.Random(seed)
+    items = []
+    index = 0
+    while len(items) < count:
+        index += 1
+        camera, lenses, long_side, short_side = rng.choice(SYNTHETIC_CAMERAS)
+        lens = rng.choice(lenses)
+        roll = rng.random()
+        if roll < 0.05:
+            jpeg_width = jpeg_height = short_side
+        elif roll < 0.35:
+            jpeg_width, jpeg_height = short_side, long_side
+        else:
+            jpeg_width, jpeg_height = long_side, short_side
+        directory = f"{root_dir}/{100 + index // 1000:03d}_{camera}"
+        base_name = f"P{index:07d}"
+
+        pairing = rng.random()
+        if pairing < 0.9:
+            items.append(FakeMediaPoolItem({
+                "Clip Name": f"{base_name}.JPG",
+                "File Path": f"{directory}/{base_name}.JPG",
+                "Format": "JPEG",
+                "Type": still_type,
+                "Resolution": f"{jpeg_width}x{jpeg_height}",
+            }, {"Camera TC Type": camera, "Lens Type": lens}))
+        if pairing < 0.8 or pairing >= 0.9:
+            items.append(FakeMediaPoolItem({
+                "Clip Name": f"{base_name}.DNG",
+                "File Path": f"{directory}/{base_name}.DNG",
+                "Format": "DNG",
+                "Type": still_type,
+                "Resolution": f"{long_side}x{short_side}",
+            }))
+    del items[count:]
+    folder.clips.extend(items)
+    return items
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""画像ファイルのヘッダー読み取り（TiffHeaderReader・read_image_header）のテスト
+
+バイト列で組み立てたJPEG・DNGを一時ファイルに書き出して解析します。
+DaVinci Resolveは不要で、`python -m unittest discover tests` で実行できます。
+"""
+
+import os
+import struct
+import sys
+import tempfile
+import unittest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(TESTS_DIR), "bench"))
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+
+import fake_resolve
+fake_resolve.install()
+
+import DRSorter
+
+# TIFFのデータ型
+ASCII, SHORT, LONG = 2, 3, 4
+
+def ascii_tag(tag: int, text: str) -> tuple:
+    """ASCIIのタグ（NUL終端）"""
+    return tag, ASCII, text.encode() + b"\0"
+
+def build_tiff(ifds: list, endian: str = "<") -> bytes:
+    """IFDのリストからTIFFのバイト列を作成
+
+    各IFDは(タグ, 型, 値)のリストです。値はASCIIの場合はbytes、数値の場合はintのリストで、
+    ("ifd", n)を指定するとn番目のIFDのオフセットになります。先頭のIFDだけを最初のIFDとして参照します。
+    """
+    def payload(value_type, values, offsets):
+        if value_type == ASCII:
+            return values, len(values)
+        values = [offsets[v[1]] if isinstance(v, tuple) else v for v in values]
+        code = "H" if value_type == SHORT else "I"
+        return struct.pack(f"{endian}{len(values)}{code}", *values), len(values)
+
+    # 値がエントリに収まらないタグのデータは各IFDの直後に置く
+    offsets = []
+    position = 8
+    for ifd in ifds:
+        offsets.append(position)
+        sizes = [len(payload(value_type, values, [0] * len(ifds))[0]) for _, value_type, values in ifd]
+        data_size = sum(size for size in sizes if size > 4)
+        position += 2 + 12 * len(ifd) + 4 + data_size
+
+    header = (b"II*\0" if endian == "<" else b"MM\0*") + struct.pack(endian + "I", 8)
+    body = b""
+    for index, ifd in enumerate(ifds):
+        data_offset = offsets[index] + 2 + 12 * len(ifd) + 4
+        entries = struct.pack(endian + "H", len(ifd))
+        data = b""
+        for tag, value_type, values in sorted(ifd, key=lambda entry: entry[0]):
+            raw, count = payload(value_type, values, offsets)
+            if len(raw) > 4:
+                entries += struct.pack(endian + "HHII", tag, value_type, count, data_offset + len(data))
+                data += raw
+            else:
+                entries += struct.pack(endian + "HHI", tag, value_type, count) + raw.ljust(4, b"\0")
+        body += entries + struct.pack(endian + "I", 0) + data
+    return header + body
+
+def build_dng(width: int = 6000, height: int = 4000, model: str = "ILCE-7M4", lens: str = "FE 24-70mm F2.8 GM II",
+              endian: str = "<", extra_ifd0: tuple = ()) -> bytes:
+    """サムネイルのIFD0、メイン画像のSubIFD、EXIF IFDを持つDNG"""
+    ifd0 = [(0x00FE, LONG, [1]), (0x0100, LONG, [256]), (0x0101, LONG, [171]), ascii_tag(0x0110, model),
+            (0x014A, LONG, [("ifd", 1)]), (0x8769, LONG, [("ifd", 2)])]
+    ifd0 = [entry for entry in ifd0 if entry[0] not in {tag for tag, _, _ in extra_ifd0}] + list(extra_ifd0)
+    main = [(0x00FE, LONG, [0]), (0x0100, LONG, [width]), (0x0101, LONG, [height])]
+    exif = [ascii_tag(0xA434, lens)]
+    return build_tiff([ifd0, main, exif], endian)
+
+def build_jpeg(width: int = 6000, height: int = 4000, model: str = "X-T5", lens: str = "XF23mmF1.4 R LM WR",
+               orientation: int = 1) -> bytes:
+    """EXIF（APP1）とSOF0を持つJPEG"""
+    exif = build_tiff([[ascii_tag(0x0110, model), (0x0112, SHORT, [orientation]), (0x8769, LONG, [("ifd", 1)])],
+                       [ascii_tag(0xA434, lens), (0xA002, LONG, [160]), (0xA003, LONG, [120])]])
+    app1 = b"Exif\0\0" + exif
+    return (b"\xff\xd8"
+            + b"\xff\xe1" + struct.pack(">H", len(app1) + 2) + app1
+            + b"\xff\xc0" + struct.pack(">HBHHB", 11, 8, height, width, 1) + b"\x01\x11\x00"
+            + b"\xff\xda" + struct.pack(">H", 8) + b"\0" * 6 + b"\xff\xd9")
+
+class HeaderReaderTest(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.work_dir.cleanup)
+
+    def read(self, name: str, data: bytes):
+        path = os.path.join(self.work_dir.name, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return DRSorter.read_image_header(path)
+
+    def test_dng_reads_main_image_from_sub_ifd(self):
+        for endian in ("<", ">"):
+            with self.subTest(endian=endian):
+                self.assertEqual(self.read("a.dng", build_dng(endian=endian)), {
+                    "camera_type": "ILCE-7M4", "lens_type": "FE 24-70mm F2.8 GM II", "width": 6000, "height": 4000})
+
+    def test_jpeg_uses_sof_size_and_orientation(self):
+        self.assertEqual(self.read("a.jpg", build_jpeg()), {
+            "camera_type": "X-T5", "lens_type": "XF23mmF1.4 R LM WR", "width": 6000, "height": 4000})
+        self.assertEqual(self.read("b.jpg", build_jpeg(orientation=6))["width"], 4000)
+
+    def test_zero_count_orientation_falls_back(self):
+        self.assertIsNone(self.read("a.dng", build_dng(extra_ifd0=((0x0112, SHORT, []),))))
+
+    def test_numeric_model_falls_back(self):
+        self.assertIsNone(self.read("a.dng", build_dng(extra_ifd0=((0x0110, SHORT, [5]),))))
+
+    def test_empty_model_is_omitted(self):
+        metadata = self.read("a.dng", build_dng(model=""))
+        self.assertNotIn("camera_type", metadata)
+        self.assertEqual(metadata["lens_type"], "FE 24-70mm F2.8 GM II")
+
+    def test_truncated_files_fall_back(self):
+        for name, data in (("a.dng", build_dng()[:40]), ("a.jpg", build_jpeg()[:30]), ("b.jpg", b"\xff\xd8\xff\xe1\0\0")):
+            with self.subTest(name=name):
+                self.assertIsNone(self.read(name, data))
+
+    def test_ifd_loop_terminates(self):
+        # 次のIFDのオフセットが自分自身を指すファイル
+        data = bytearray(build_tiff([[(0x0100, LONG, [100]), (0x0101, LONG, [50])]]))
+        struct.pack_into("<I", data, 8 + 2 + 12 * 2, 8)
+        self.assertEqual(self.read("loop.tif", bytes(data)), {"width": 100, "height": 50})
+
+    def test_unknown_signature_is_none(self):
+        self.assertIsNone(self.read("a.heic", b"\0\0\0\x18ftypheic"))
+
+    def test_reader_collects_results_per_file(self):
+        good = os.path.join(self.work_dir.name, "good.dng")
+        bad = os.path.join(self.work_dir.name, "bad.dng")
+        with open(good, "wb") as f:
+            f.write(build_dng())
+        with open(bad, "wb") as f:
+            f.write(build_dng(extra_ifd0=((0x0112, SHORT, []),)))
+        results = DRSorter.HeaderMetadataReader(2).read_all([good, bad])
+        self.assertEqual(results[good]["camera_type"], "ILCE-7M4")
+        self.assertIsNone(results[bad])
+
+if __name__ == "__main__":
+    unittest.main()